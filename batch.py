@@ -0,0 +1,147 @@
+# Property of Whisper Aero
+
+#################################################################################
+# This file runs the main.py filter over many PAK files in one go. Inputs are   #
+# given as file names / glob patterns and/or a manifest file, and are processed #
+# in a process pool so NumPy/SciPy and the DLL are loaded once per worker       #
+# instead of once per file. Every file is reported as OK or ERROR, followed by  #
+# a summary. The filter itself is main.filter_data_set, edit it there.          #
+#                                                                               #
+# Usage:                                                                        #
+#   python batch.py -o <output_dir> [-j N] <input files or globs ...>           #
+#   python batch.py -m manifest.txt [-o <output_dir>] [-j N]                    #
+#   -f/--filters takes a filter chain as in main.py (spec or @config.json)      #
+#   -i/--incremental only refilters data sets that changed since the last run   #
+# A manifest has one input per line, optionally followed by its output file.    #
+# Empty lines and lines starting with # are ignored.                            #
+#################################################################################
+
+import argparse
+import concurrent.futures
+import glob
+import os
+import sys
+import time
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+
+def read_manifest(manifest):
+    jobs = []
+    with open(manifest, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split(None, 1)
+            jobs.append((parts[0], parts[1].strip() if len(parts) > 1 else None))
+    return jobs
+
+def expand_inputs(patterns):
+    # Patterns without a match are kept so they are reported as failures
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        files.extend(matches if matches else [pattern])
+    return files
+
+# Returns a list of (input file, output file) pairs
+def collect_jobs(patterns, manifest=None, output_dir=None):
+    jobs = [(ifile, None) for ifile in expand_inputs(patterns)]
+    if manifest is not None:
+        jobs.extend(read_manifest(manifest))
+    resolved = []
+    outputs = {}
+    for ifile, ofile in jobs:
+        if ofile is None:
+            if output_dir is None:
+                raise ValueError(f"No output file for {ifile}, give an output directory")
+            ofile = os.path.join(output_dir, os.path.basename(ifile))
+        if os.path.abspath(ifile) == os.path.abspath(ofile):
+            raise ValueError(f"Output file would overwrite input file: {ifile}")
+        # Inputs with the same name in different directories would be written
+        # to one output file by two workers at once
+        key = os.path.normcase(os.path.abspath(ofile))
+        if key in outputs:
+            raise ValueError(f"{outputs[key]} and {ifile} would both be written to {ofile}")
+        outputs[key] = ifile
+        resolved.append((ifile, ofile))
+    return resolved
+
+# Runs in the worker processes, never raises so one bad file cannot stop the batch
+def process_one(ifile, ofile, filters=None, incremental=False):
+    from main import process_file, process_file_incremental, FilterChain
+    start = time.perf_counter()
+    try:
+        chain = FilterChain.from_arg(filters) if filters else None
+        if incremental:
+            process_file_incremental(ifile, ofile, chain)
+        else:
+            process_file(ifile, ofile, chain)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return ifile, ofile, error, time.perf_counter() - start
+
+# Returns a list of (input file, output file, error or None, seconds) in job order
+# A worker that dies (e.g. killed or crashed in the DLL) breaks the pool: its job
+# and the jobs that can no longer run are reported as errors, the others keep
+# their results and the summary is always printed
+def run_batch(jobs, workers=None, report=print, filters=None, incremental=False):
+    results = [None] * len(jobs)
+
+    def finish(i, result):
+        results[i] = result
+        ifile, ofile, error, seconds = result
+        if error is None:
+            report(f"[OK] {ifile} -> {ofile} ({seconds:.2f} s)")
+        else:
+            report(f"[ERROR] {ifile}: {error}")
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for i, (ifile, ofile) in enumerate(jobs):
+            try:
+                futures[pool.submit(process_one, ifile, ofile, filters, incremental)] = i
+            except Exception as e:
+                finish(i, (ifile, ofile, f"{type(e).__name__}: {e}", 0.0))
+        for future in concurrent.futures.as_completed(futures):
+            i = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                ifile, ofile = jobs[i]
+                result = (ifile, ofile, f"{type(e).__name__}: {e}", 0.0)
+            finish(i, result)
+    n_failed = sum(1 for result in results if result[2] is not None)
+    report(f"{len(results) - n_failed} of {len(results)} files processed, {n_failed} failed")
+    return results
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Apply the main.py filter to many PAK files in parallel")
+    parser.add_argument("inputs", nargs="*", help="input files or glob patterns")
+    parser.add_argument("-m", "--manifest", help="file listing inputs (and optionally outputs), one per line")
+    parser.add_argument("-o", "--output-dir", help="directory for outputs without an explicit output file")
+    parser.add_argument("-f", "--filters", help="filter chain, inline spec or @config.json (default: main.py filters)")
+    parser.add_argument("-i", "--incremental", action="store_true",
+                        help="skip data sets whose input and filters did not change since the last run")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes (default: CPU count)")
+    args = parser.parse_args(argv[1:])
+
+    if not args.inputs and args.manifest is None:
+        parser.error("no input files given")
+    jobs = collect_jobs(args.inputs, args.manifest, args.output_dir)
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    results = run_batch(jobs, args.workers, filters=args.filters, incremental=args.incremental)
+    return 1 if any(result[2] is not None for result in results) else 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main(sys.argv))
+    except Exception as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
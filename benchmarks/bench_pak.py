@@ -0,0 +1,177 @@
+# Property of Whisper Aero
+
+#################################################################################
+# This file benchmarks the read -> convert -> filter -> write path of main.py.  #
+# It generates synthetic PAK files (samples = nx * nz, real or complex ydata),  #
+# times every stage on its own and writes the results as JSON so runs of        #
+# different versions can be compared.                                           #
+#                                                                               #
+# Usage:                                                                        #
+#   python benchmarks/bench_pak.py [-o results.json] [--max-samples 1e7]        #
+#          [--samples 1e3 1e4 ...] [--nz 1 10 ...] [--cplx 1 2] [--repeat 3]    #
+#   python benchmarks/bench_pak.py --compare old.json new.json                  #
+#################################################################################
+
+import argparse
+import ctypes
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from read_write import *
+from my_function import apply_gaussian_filter
+
+READ_MODE = 1
+WRITE_MODE = 2
+
+DEFAULT_SAMPLES = [1e3, 1e4, 1e5, 1e6, 1e7, 1e8]
+DEFAULT_NZ = [1, 10, 100, 1000]
+DEFAULT_CPLX = [1, 2]
+
+STAGES = ["open", "header", "read_one_data_set", "to_np_array", "as_np_array",
+          "filter", "copy_bin_data", "write_one_data_set"]
+
+
+# Write a file with one data set of nx * nz samples
+def generate_file(filename, nx, nz, y_cplx):
+    template = BinPakData()
+    template.name = f"bench nx={nx} nz={nz} cplx={y_cplx}".encode('utf-8')
+    template.xCplx = template.zCplx = template.yCplx = 1
+    x = np.arange(nx, dtype=np.float64) * 1e-3
+    y = np.sin(np.arange(nx * nz, dtype=np.float64) * 0.01).reshape(nz, nx)
+    if y_cplx == 2:
+        y = y + 1j * np.cos(y)
+    df = py_open_pak_bin_file(filename, ctypes.byref(ctypes.c_short()), WRITE_MODE)
+    write_data_sets(df, 1, iter([(0, 1, copy_bin_data(template, x, y, np.arange(nz, dtype=np.float64)))]))
+    py_close_pak_bin_file(df)
+
+# Run every stage once and return {stage: seconds}
+def time_stages(ifile, ofile):
+    timings = {}
+    def timed(stage, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        timings[stage] = time.perf_counter() - start
+        return result
+
+    n_data_arrays, n_data_sets = ctypes.c_short(), ctypes.c_long()
+    df_i = timed("open", py_open_pak_bin_file, ifile, ctypes.byref(n_data_arrays), READ_MODE)
+    timed("header", py_read_data_set_header, df_i, ctypes.byref(n_data_sets))
+    p_data = timed("read_one_data_set", py_read_one_data_set, df_i)
+    data = p_data.contents
+
+    def to_np_array():
+        return xdata_to_np_array(data), ydata_to_np_array(data), zdata_to_np_array(data)
+    def as_np_array():
+        y = ydata_as_complex_array(data) if data.yCplx == 2 else ydata_as_np_array(data)
+        return xdata_as_np_array(data), y, zdata_as_np_array(data)
+    timed("to_np_array", to_np_array)
+    x, y, z = timed("as_np_array", as_np_array)
+
+    filtered_y = timed("filter", apply_gaussian_filter, y)
+    new_data_ptr = timed("copy_bin_data", copy_bin_data, data, x, filtered_y, z)
+
+    df_o = py_open_pak_bin_file(ofile, ctypes.byref(ctypes.c_short()), WRITE_MODE)
+    py_write_pak_bin_file_header(df_o, 1)
+    py_write_data_set_header(df_o, 1)
+    timed("write_one_data_set", py_write_one_data_set, df_o, new_data_ptr)
+    py_close_pak_bin_file(df_o)
+
+    del x, y, z, new_data_ptr
+    py_free_bin_pak_data(p_data)
+    py_close_pak_bin_file(df_i)
+    return timings
+
+def run_benchmarks(samples=DEFAULT_SAMPLES, nz_values=DEFAULT_NZ, cplx_values=DEFAULT_CPLX,
+                   repeat=3, max_samples=None, report=print):
+    results = []
+    tmp_dir = tempfile.mkdtemp(prefix="pak_bench_")
+    try:
+        ifile = os.path.join(tmp_dir, "in.pak52")
+        ofile = os.path.join(tmp_dir, "out.pak52")
+        for n_samples in (int(s) for s in samples):
+            if max_samples is not None and n_samples > max_samples:
+                continue
+            for nz in (int(n) for n in nz_values):
+                nx = n_samples // nz
+                if nx < 1:
+                    continue
+                for y_cplx in cplx_values:
+                    generate_file(ifile, nx, nz, y_cplx)
+                    runs = []
+                    for _ in range(repeat):
+                        if os.path.exists(ofile):
+                            os.remove(ofile)
+                        runs.append(time_stages(ifile, ofile))
+                    case = {"samples": nx * nz, "nx": nx, "nz": nz, "y_cplx": y_cplx,
+                            "file_bytes": os.path.getsize(ifile), "repeat": repeat, "stages": {}}
+                    for stage in STAGES:
+                        seconds = [run[stage] for run in runs]
+                        case["stages"][stage] = {"min": min(seconds), "median": statistics.median(seconds)}
+                    results.append(case)
+                    report(f"samples={nx * nz:>10} nz={nz:>5} cplx={y_cplx}  " +
+                           "  ".join(f"{stage}={case['stages'][stage]['min'] * 1e3:.2f}ms" for stage in STAGES))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "engine": pak_engine(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+# Print new / old ratios of the minimum times for every case both files share
+def compare(old, new, report=print):
+    def key(case):
+        return case["nx"], case["nz"], case["y_cplx"]
+    old_cases = {key(case): case for case in old["results"]}
+    for case in new["results"]:
+        if key(case) not in old_cases:
+            continue
+        old_stages = old_cases[key(case)]["stages"]
+        ratios = [f"{stage}={case['stages'][stage]['min'] / old_stages[stage]['min']:.2f}x"
+                  for stage in STAGES if stage in old_stages and old_stages[stage]['min'] > 0]
+        report(f"samples={case['samples']:>10} nz={case['nz']:>5} cplx={case['y_cplx']}  " + "  ".join(ratios))
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the PAK read/convert/filter/write stages")
+    parser.add_argument("-o", "--output", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--samples", type=float, nargs="+", default=DEFAULT_SAMPLES, help="total samples nx * nz")
+    parser.add_argument("--nz", type=int, nargs="+", default=DEFAULT_NZ)
+    parser.add_argument("--cplx", type=int, nargs="+", default=DEFAULT_CPLX, choices=[1, 2])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-samples", type=float, default=None, help="skip cases larger than this")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    args = parser.parse_args(argv[1:])
+
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            compare(json.load(f_old), json.load(f_new))
+        return 0
+
+    results = run_benchmarks(args.samples, args.nz, args.cplx, args.repeat, args.max_samples,
+                             report=lambda line: print(line, file=sys.stderr))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
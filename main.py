@@ -4,49 +4,54 @@
 
 #################################################################################
 # This file is the driver to open binary files, read the data, scale it in      #
-# python, and write it to an output file. This program relies on nz = 1,        #
-# n_data_arrays = 1, n_data_sets = 1. The program is easily adaptable, however, #
-# if one of those assumptions does not hold.                                    #
+# python, and write it to an output file. Every data set of every data set      #
+# array is streamed through filter_data_set one at a time, so memory use does   #
+# not grow with the size of the file. ydata is one (nz, nx * yCplx) array.      #
 #################################################################################
 
 import sys
 import os
 import ctypes
+import inspect
+
+import numpy as np
 
 
 # Line below needed in some instances depending on file structure and where program is called from
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from read_write import *
 from my_function import *
+import my_function
+import pak_float32
+import pak_incremental
+import pak_instrument
+import pak_pipeline
+import pak_pyramid
 
 READ_MODE = 1
 WRITE_MODE = 2
 
-# ADD ADDITIONAL ARGUMENTS AND PROCESSING HERE IF NEEDED
-if len(sys.argv) != 3:
-    print("[ERROR] Usage: python main.py <input_file.bin> <output_file.bin>")
-    sys.exit(1)
-ifile = sys.argv[1]
-ofile = sys.argv[2]
-
-def main():
-    n_data_arrays = ctypes.c_short()
-    dummy = ctypes.c_short()
-    n_data_sets = ctypes.c_long()
-
-    df_i = py_open_pak_bin_file(ifile, ctypes.byref(n_data_arrays), READ_MODE)
-    df_o = py_open_pak_bin_file(ofile, ctypes.byref(dummy), WRITE_MODE)
-    py_write_pak_bin_file_header(df_o, n_data_arrays)
+# Called once per data set, returns the new BinPakData to write
+# If a FilterChain is given it replaces the filters in the EDIT section below
+# float32 (True or a set of data set names) filters ydata in single precision,
+# see pak_float32.py
+def filter_data_set(data, chain=None, float32=False):
+    # Convert to Python (do this for each data array even if not scaling)
+    # y_array has one row per z value, filters run along the last axis
+    # Complex data (yCplx = 2) comes as complex128 and is written back as complex
+    if pak_float32.use_float32(data, float32):
+        y_array = ydata_as_float32_array(data)
+    else:
+        y_array = ydata_as_complex_array(data) if data.yCplx == 2 else ydata_as_np_array(data)
+    z_array = zdata_to_np_array(data)
 
-    py_read_data_set_header(df_i, ctypes.byref(n_data_sets))
-    py_write_data_set_header(df_o, n_data_sets)
-    in_data_set_ptr = py_read_one_data_set(df_i)
-    data = in_data_set_ptr.contents
+    if chain is not None:
+        # x is a UniformAxis (x0, dx, n) when evenly spaced, it turns into a full
+        # array only if a stage of the chain needs the values
+        filtered_xdata, filtered_ydata, filtered_zdata = chain(xdata_as_axis(data), y_array, z_array)
+        return copy_bin_data(data, filtered_xdata, _detach_ydata(filtered_ydata, y_array), filtered_zdata)
 
-    # Convert to Python (do this for each data array even if not scaling)
-    y_array = ydata_to_np_array(data)
     x_array = xdata_to_np_array(data)
-    z_array = zdata_to_np_array(data)
 
     # ============= EDIT BELOW THIS LINE =============
     # Change filter here (if not applying a filter, just assign the array directly i.e. filtered_ydata = y_array)
@@ -57,19 +62,111 @@ def main():
     # ============= EDIT ABOVE THIS LINE =============
 
     # Create new BinPakData object for filtered data
-    new_filtered_data_ptr = copy_bin_data(data, filtered_xdata, filtered_ydata, filtered_zdata)
+    return copy_bin_data(data, filtered_xdata, _detach_ydata(filtered_ydata, y_array), filtered_zdata)
 
-    py_write_one_data_set(df_o, new_filtered_data_ptr)
+# y_array is a view into the input data set, which is freed once the next data
+# set is read. ydata left unfiltered (or a view of it) is copied so the filtered
+# data set does not hold the input buffers past their free.
+def _detach_ydata(filtered_ydata, y_array):
+    return np.array(filtered_ydata) if np.may_share_memory(filtered_ydata, y_array) else filtered_ydata
 
-    # Free memory after use (no need to free new_filtered_data_ptr as it is not allocated in C)
-    py_free_bin_pak_data(in_data_set_ptr) 
-    py_close_pak_bin_file(df_i)
-    py_close_pak_bin_file(df_o)
+# Filters one input file into one output file (also used by batch.py)
+def process_file(ifile, ofile, chain=None, float32=False):
+    n_data_arrays = ctypes.c_short()
+    dummy = ctypes.c_short()
+
+    df_i = py_open_pak_bin_file(ifile, ctypes.byref(n_data_arrays), READ_MODE)
+    try:
+        df_o = py_open_pak_bin_file(ofile, ctypes.byref(dummy), WRITE_MODE)
+        try:
+            # Input data sets are freed by iter_data_sets once they have been written
+            # (no need to free the filtered data as it is not allocated in C)
+            filtered_data_sets = ((i_array, n_data_sets, filter_data_set(in_data_set_ptr.contents, chain, float32))
+                                  for i_array, n_data_sets, in_data_set_ptr in iter_data_sets(df_i, n_data_arrays))
+            write_data_sets(df_o, n_data_arrays, filtered_data_sets)
+        finally:
+            py_close_pak_bin_file(df_o)
+    finally:
+        # Files are closed even on errors so a batch worker does not leak descriptors
+        py_close_pak_bin_file(df_i)
+
+# Like process_file, but reading, filtering and writing overlap: the next data
+# sets are read and the previous ones written while one is filtered (see
+# pak_pipeline.py). At most max_in_flight data sets are in memory at once.
+def process_file_pipelined(ifile, ofile, chain=None, max_in_flight=pak_pipeline.DEFAULT_MAX_IN_FLIGHT, float32=False):
+    n_data_arrays = ctypes.c_short()
+    dummy = ctypes.c_short()
+
+    df_i = py_open_pak_bin_file(ifile, ctypes.byref(n_data_arrays), READ_MODE)
+    try:
+        df_o = py_open_pak_bin_file(ofile, ctypes.byref(dummy), WRITE_MODE)
+        try:
+            # Input data sets are freed once their filtered copy has been written
+            pak_pipeline.run_pipeline(
+                iter_data_sets(df_i, n_data_arrays, free=False),
+                lambda item: (item[0], item[1], filter_data_set(item[2].contents, chain, float32)),
+                lambda filtered_data_sets: write_data_sets(df_o, n_data_arrays, filtered_data_sets),
+                release=lambda item, filtered: py_free_bin_pak_data(item[2]),
+                max_in_flight=max_in_flight)
+        finally:
+            py_close_pak_bin_file(df_o)
+    finally:
+        py_close_pak_bin_file(df_i)
+
+# Hash of what decides the filter output: the chain if one is given, otherwise
+# the EDIT section of filter_data_set, and in both cases the code in my_function.py
+# and the data sets filtered in float32
+def filter_config_hash(chain=None, float32=False):
+    parts = (inspect.getsource(filter_data_set), inspect.getsource(my_function),
+             chain.describe() if chain is not None else None)
+    if float32:
+        parts += (("float32", pak_float32.describe(float32)),)
+    return pak_incremental.config_hash(*parts)
+
+# Like process_file, but only data sets that changed since the last incremental
+# run into the same output are filtered, the others are copied from the previous
+# output (see pak_incremental.py). Returns (data sets reused, data sets filtered)
+def process_file_incremental(ifile, ofile, chain=None, float32=False):
+    return pak_incremental.process_incremental(ifile, ofile, lambda data: filter_data_set(data, chain, float32),
+                                               filter_config_hash(chain, float32))
+
+USAGE = ("Usage: python main.py <input_file.bin> <output_file.bin> [filters | @filters.json] "
+         "[--incremental | --pipeline[=max_in_flight]] [--pyramid[=base_level]] [--float32[=name,name...]]")
+
+def main(argv):
+    # ADD ADDITIONAL ARGUMENTS AND PROCESSING HERE IF NEEDED
+    options = dict(arg[2:].partition("=")[::2] for arg in argv[1:] if arg.startswith("--"))
+    argv = [arg for arg in argv if not arg.startswith("--")]
+    if (len(argv) not in (3, 4) or not set(options) <= {"incremental", "pipeline", "pyramid", "float32"}
+            or {"incremental", "pipeline"} <= set(options)):
+        print(f"[ERROR] {USAGE}")
+        sys.exit(1)
+    ifile = argv[1]
+    ofile = argv[2]
+    chain = FilterChain.from_arg(argv[3]) if len(argv) == 4 else None
+    # --float32 filters every data set in single precision, --float32=a,b only data sets a and b
+    float32 = "float32" in options and (set(options["float32"].split(",")) if options["float32"] else True)
+    if "incremental" in options:
+        n_reused, n_filtered = process_file_incremental(ifile, ofile, chain, float32)
+        print(f"{ofile}: {n_filtered} data set(s) filtered, {n_reused} unchanged")
+    elif "pipeline" in options:
+        process_file_pipelined(ifile, ofile, chain, int(options["pipeline"] or pak_pipeline.DEFAULT_MAX_IN_FLIGHT),
+                               float32)
+    else:
+        process_file(ifile, ofile, chain, float32)
+
+    # Min/max pyramid next to the output for fast plotting (see pak_pyramid.py)
+    if "pyramid" in options:
+        pak_pyramid.build_pyramid(ofile, int(options["pyramid"] or pak_pyramid.DEFAULT_BASE_LEVEL))
+
+    # Per-function timing and memory summary when run with PAK_INSTRUMENT=1
+    if pak_instrument.is_enabled():
+        pak_instrument.dump()
 
 
 if __name__ == "__main__":
     try:
-        main()
+        main(sys.argv)
     except Exception as e:
         print(f"[ERROR] {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -4,22 +4,62 @@
 
 #################################################################################
 # This file is called from main and is used to scale the ydata using python     #
-# packages. Import packages and define the functions below. This program relies #
-# on nz = 1.                                                                    #
+# packages. Import packages and define the functions below. ydata is passed as  #
+# one (nz, nx * yCplx) array, so filters should work along the last axis to     #
+# process all nz rows in one vectorized call.                                   #
+#                                                                               #
+# Filters registered with @register_filter can be chained without editing       #
+# main.py, e.g. python main.py in.bin out.bin "gaussian:sigma=3,threshold"      #
+# or from a JSON config file: python main.py in.bin out.bin @filters.json       #
 #################################################################################
 
 # May need to add imports
-from scipy.ndimage import gaussian_filter1d # EXAMPLE
+# Import heavy packages (SciPy, ...) inside the functions that use them, as in
+# apply_gaussian_filter below, so runs that do not call them start faster
+import ast
+import json
 import numpy as np
 
 # EDIT/ADD IMPORTS DIRECTLY ABOVE THIS LINE
 #######################################################
+# FILTER REGISTRY
+# A stage declares how the chain may call it:
+#   in_place: the function takes out= and can write its result into its input
+#   strided:  the function accepts non-contiguous views (no contiguous copy needed)
+#   mask:     the function returns a boolean keep-mask over the samples of y,
+#             which is applied to both x and y so the pairs stay consistent
+#   targets:  the arrays ("x", "y", "z") the stage is applied to by default,
+#             can be overridden per stage with on=xy / on=y / ...
+class FilterStage:
+    def __init__(self, name, function, in_place=False, strided=False, mask=False, targets="xyz"):
+        self.name = name
+        self.function = function
+        self.in_place = in_place
+        self.strided = strided
+        self.mask = mask
+        self.targets = targets
+
+FILTERS = {}
+
+def register_filter(name, in_place=False, strided=False, mask=False, targets="xyz"):
+    def decorator(function):
+        FILTERS[name] = FilterStage(name, function, in_place, strided, mask, targets)
+        return function
+    return decorator
+
 # EXAMPLES
-def apply_gaussian_filter(arr, sigma = 2): 
-    return gaussian_filter1d(arr, sigma = sigma)
+@register_filter("gaussian", in_place=True, strided=True)
+def apply_gaussian_filter(arr, sigma = 2, axis = -1, out = None):
+    from scipy.ndimage import gaussian_filter1d # EXAMPLE
+    return gaussian_filter1d(arr, sigma = sigma, axis = axis, output = out)
+
+@register_filter("scale", in_place=True, strided=True, targets="y")
+def ex_scale(arr, factor = 1.0, out = None):
+    return np.multiply(arr, factor, out = out)
 
-def ex_diff(arr):
-    return np.diff(arr)
+@register_filter("diff", strided=True, targets="xy")
+def ex_diff(arr, axis = -1):
+    return np.diff(arr, axis = axis)
 
 def ex_a_range(arr):
     return np.arange(len(arr)/5)
@@ -27,7 +67,110 @@ def ex_a_range(arr):
 def filter_below_threshold(arr, threshold=0.5):
     return arr[arr <= threshold]
 
+@register_filter("threshold", strided=True, mask=True, targets="xy")
+def below_threshold_mask(arr, threshold=0.5):
+    return arr <= threshold
+
+#######################################################
+# FILTER CHAIN
+# Floating point arrays keep their precision (float32 / complex64 in the float32
+# working mode), anything else is filtered as float64
+def _working_dtype(arr):
+    return arr.dtype if arr.dtype in (np.float32, np.complex64) else np.result_type(arr, np.float64)
+
+# Applies registered stages to x, y and z in order. The input arrays are never
+# modified: the first stage that needs a buffer of its own gets a copy and all
+# following in-place stages reuse it, so a run of in-place stages allocates
+# once instead of once per stage.
+class FilterChain:
+    def __init__(self, stages=()):
+        # stages: sequence of (name, params) pairs
+        self.stages = []
+        for name, params in stages:
+            if name not in FILTERS:
+                raise ValueError(f"Unknown filter {name!r}, registered filters: {', '.join(sorted(FILTERS))}")
+            params = dict(params)
+            targets = params.pop("on", FILTERS[name].targets)
+            self.stages.append((FILTERS[name], str(targets), params))
+
+    # "name:key=value:key=value,name2" -> FilterChain
+    @classmethod
+    def parse(cls, spec):
+        stages = []
+        for stage_spec in filter(None, (s.strip() for s in spec.split(","))):
+            name, *assignments = stage_spec.split(":")
+            params = {}
+            for assignment in assignments:
+                key, _, value = assignment.partition("=")
+                try:
+                    params[key.strip()] = ast.literal_eval(value.strip())
+                except (ValueError, SyntaxError):
+                    params[key.strip()] = value.strip()
+            stages.append((name.strip(), params))
+        return cls(stages)
+
+    # JSON config: [{"filter": "gaussian", "sigma": 3}, {"filter": "threshold"}]
+    @classmethod
+    def from_config(cls, filename):
+        with open(filename, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        return cls([(stage.pop("filter"), stage) for stage in config])
+
+    # Command line argument: "@config.json" or an inline spec
+    @classmethod
+    def from_arg(cls, arg):
+        return cls.from_config(arg[1:]) if arg.startswith("@") else cls.parse(arg)
+
+    # Stable description of the stages, e.g. for hashing the configuration
+    def describe(self):
+        return [(stage.name, targets, sorted(params.items())) for stage, targets, params in self.stages]
+
+    def __call__(self, x, y, z):
+        arrays = {"x": x, "y": y, "z": z}
+        owned = {"x": False, "y": False, "z": False}
+        for stage, targets, params in self.stages:
+            if stage.mask:
+                keep = np.asarray(stage.function(arrays["y"], **params), dtype=bool)
+                if keep.ndim > 1:
+                    # Keep a sample only if it passes in every row
+                    keep = keep.all(axis=tuple(range(keep.ndim - 1)))
+                if arrays["x"].shape[-1] != keep.shape[-1]:
+                    raise ValueError(f"Filter {stage.name!r} needs one y value per x value")
+                for key in "xy":
+                    arrays[key] = np.asarray(arrays[key])[..., keep]
+                    owned[key] = True
+                continue
+
+            for key in targets:
+                arr = arrays[key]
+                if not isinstance(arr, np.ndarray):
+                    # Array-likes such as an implicit x axis are expanded on first use
+                    arr = np.asarray(arr)
+                    owned[key] = True
+                if not stage.strided:
+                    contiguous = np.ascontiguousarray(arr)
+                    owned[key] = owned[key] or contiguous is not arr
+                    arr = contiguous
+                if stage.in_place:
+                    if not owned[key] or not arr.flags.writeable:
+                        arr = np.array(arr, dtype=_working_dtype(arr))
+                        owned[key] = True
+                    stage.function(arr, out=arr, **params)
+                else:
+                    result = stage.function(arr, **params)
+                    # A stage may return a view of its input (e.g. arr[..., ::2]), which
+                    # later in-place stages must not write into
+                    owned[key] = owned[key] or not np.may_share_memory(result, arr)
+                    arr = result
+                arrays[key] = arr
+            # on= can send x and y through different stages
+            if arrays["x"].shape[-1] != arrays["y"].shape[-1]:
+                raise ValueError(f"Filter {stage.name!r} left {arrays['x'].shape[-1]} x values "
+                                 f"for {arrays['y'].shape[-1]} y values")
+        return arrays["x"], arrays["y"], arrays["z"]
+
 #######################################################
 # Add any additional functions you need below this line
 # Pay close attention to parameters and return types
 # Return type must be numpy array unless main.py is edited
+# Decorate them with @register_filter to use them in a filter chain
@@ -0,0 +1,89 @@
+# Property of Whisper Aero
+
+#################################################################################
+# This file supports the opt-in float32 working mode. ydata is converted once   #
+# to float32 (complex64 for complex data) when it is read, filtered in single   #
+# precision and widened back to float64 when the filtered data set is built for #
+# writing, so the files do not change format. x and z stay float64: axes such   #
+# as time need the precision and are small next to ydata.                       #
+#                                                                               #
+# verify() filters every data set both ways and reports the largest absolute    #
+# and relative difference of the ydata that would be written, so the mode can   #
+# be switched on only for the channels where the error is acceptable, e.g.      #
+# python main.py in.bin out.bin --float32=channel_1,channel_2                   #
+#                                                                               #
+# Usage: python pak_float32.py <input_file.bin> [filters | @filters.json]       #
+#################################################################################
+
+import collections
+import os
+import sys
+
+import numpy as np
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from read_write import PakFile, ydata_as_np_array
+
+# max_rel_error is max_abs_error over the largest |value| of the float64 result
+PrecisionReport = collections.namedtuple("PrecisionReport", ["name", "samples", "max_abs_error", "max_rel_error"])
+
+
+def data_set_name(data):
+    return data.name.decode("utf-8", "replace")
+
+# float32: False, True (every data set) or the names of the data sets to filter
+# in single precision
+def use_float32(data, float32):
+    if isinstance(float32, bool):
+        return float32
+    return data_set_name(data) in float32
+
+# Stable form of the float32 setting, e.g. for hashing the configuration
+def describe(float32):
+    return float32 if isinstance(float32, bool) else sorted(float32)
+
+# Largest absolute difference and the largest difference relative to the peak
+# |value| of the reference. Relative errors per sample are not used: they are
+# unbounded where the signal crosses zero.
+def compare(reference, result):
+    reference, result = np.asarray(reference), np.asarray(result)
+    if reference.shape != result.shape:
+        raise ValueError(f"float32 result has shape {result.shape}, float64 result has {reference.shape}")
+    if reference.size == 0:
+        return 0.0, 0.0
+    max_abs = float(np.max(np.abs(result - reference)))
+    peak = float(np.max(np.abs(reference)))
+    if peak == 0:
+        return max_abs, 0.0 if max_abs == 0 else float("inf")
+    return max_abs, max_abs / peak
+
+# filter_function(data, float32) returns the filtered BinPakData (main.filter_data_set)
+def verify(ifile, filter_function):
+    reports = []
+    with PakFile(ifile) as pak:
+        for _, _, p_data in pak.iter_data_sets():
+            data = p_data.contents
+            reference = ydata_as_np_array(filter_function(data, False).contents, copy=True)
+            result = ydata_as_np_array(filter_function(data, True).contents, copy=True)
+            reports.append(PrecisionReport(data_set_name(data), reference.size, *compare(reference, result)))
+    return reports
+
+def format_report(reports):
+    lines = [f"{'data set':<32}{'samples':>14}{'max abs error':>16}{'max rel error':>16}"]
+    for report in reports:
+        lines.append(f"{report.name:<32}{report.samples:>14}{report.max_abs_error:>16.3e}{report.max_rel_error:>16.3e}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("[ERROR] Usage: python pak_float32.py <input_file.bin> [filters | @filters.json]")
+        sys.exit(1)
+    try:
+        from main import filter_data_set, FilterChain
+        chain = FilterChain.from_arg(sys.argv[2]) if len(sys.argv) == 3 else None
+        print(format_report(verify(sys.argv[1], lambda data, float32: filter_data_set(data, chain, float32))))
+    except Exception as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
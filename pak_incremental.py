@@ -0,0 +1,187 @@
+# Property of Whisper Aero
+
+#################################################################################
+# This file implements incremental reprocessing. Next to every output file a    #
+# manifest (<output>.pakinc) records a content hash of each input data set, a   #
+# hash of the filter configuration and where each filtered data set was written #
+# in the output. On the next run:                                               #
+#   - nothing is done if the input, the configuration and the output are        #
+#     unchanged,                                                                #
+#   - otherwise only data sets whose content hash is new are read and filtered, #
+#     the others are copied byte for byte from the previous output.             #
+# Filters work on one data set at a time, so the same input data set with the   #
+# same configuration always gives the same output bytes.                        #
+#################################################################################
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+import pak_native
+from pak_mmap import PakMemmap, atomic_write, file_key
+from pak_struct import BinPakData, row_pointers
+from read_write import np_array_to_xdata, np_array_to_zdata, _free_bin_pak_data
+
+MANIFEST_SUFFIX = ".pakinc"
+MANIFEST_VERSION = 1
+
+COPY_CHUNK_SIZE = 64 << 20
+
+
+def manifest_path(ofile):
+    return os.fspath(ofile) + MANIFEST_SUFFIX
+
+# Hash of everything that decides what the filter does, e.g. the filter chain and
+# the source code of the filter functions. Parts must have a stable repr().
+def config_hash(*parts):
+    return hashlib.blake2b(repr((MANIFEST_VERSION, pak_native.NATIVE_ORDER) + parts).encode("utf-8"),
+                           digest_size=16).hexdigest()
+
+def load_manifest(ofile):
+    try:
+        with open(manifest_path(ofile), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+def save_manifest(ofile, manifest):
+    with atomic_write(manifest_path(ofile), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+# File keys are stored as JSON lists
+def _same_file(key, filename):
+    return tuple(key) == file_key(filename)
+
+def _data_set_start(entry):
+    return entry.x_offset - pak_native.DATA_INFO_SIZE - pak_native.NAME_SIZE
+
+def _read_range(fobj, start, end):
+    fobj.seek(start)
+    while start < end:
+        chunk = fobj.read(min(COPY_CHUNK_SIZE, end - start))
+        if not chunk:
+            raise ValueError(f"Unexpected end of file in {fobj.name}")
+        start += len(chunk)
+        yield chunk
+
+# Content hash of every data set, in file order. The byte order is part of the
+# hash since the values are hashed as they are stored.
+def hash_data_sets(ifile, pak):
+    hashes = []
+    with open(ifile, "rb") as fobj:
+        for entry in pak.entries:
+            digest = hashlib.blake2b(pak.order.encode("ascii"), digest_size=16)
+            for chunk in _read_range(fobj, _data_set_start(entry), entry.end_offset):
+                digest.update(chunk)
+            hashes.append(digest.hexdigest())
+    return hashes
+
+# Native order BinPakData of one data set, read straight from the memory map
+def _read_data_set(pak, ifile_obj, i):
+    entry = pak.entries[i]
+    x, y, z = pak.channel(i, native=True)
+    data = BinPakData()
+    ifile_obj.seek(_data_set_start(entry))
+    data.name = ifile_obj.read(pak_native.NAME_SIZE).split(b"\0", 1)[0]
+    data.xCplx, data.nx = entry.x_cplx, entry.nx
+    data.zCplx, data.nz = entry.z_cplx, entry.nz
+    data.yCplx = entry.y_cplx
+    # The memory map is read-only, so the values are copied
+    data.xdata = np_array_to_xdata(x)
+    data.zdata = np_array_to_zdata(z)
+    data.ydata = row_pointers(np.array(y, dtype=np.float64))
+    return data
+
+def _check(ret, what):
+    if ret < 0:
+        raise RuntimeError(f"Failed to write {what}")
+
+# Write the output to df, copying the data sets found in previous (content hash
+# -> (offset, length) in old) and filtering the others. Returns the manifest
+# entries of the data sets written and the number of data sets reused.
+def _write_output(df, pak, ifile_obj, old, hashes, previous, filter_function):
+    _check(pak_native.writePakBinFileHeader(df, pak.n_data_arrays), "PAK bin file header")
+    offset = pak_native.FILE_HEADER_SIZE
+    counts = np.bincount([entry.array_index for entry in pak.entries], minlength=pak.n_data_arrays)
+
+    data_sets = []
+    n_reused = 0
+    for i_array, n_data_sets in enumerate(counts):
+        _check(pak_native.writeDataSetHeader(df, int(n_data_sets)), "data set header")
+        offset += pak_native.DATA_SET_HEADER_SIZE
+        for _ in range(n_data_sets):
+            content_hash = hashes[len(data_sets)]
+            if content_hash in previous:
+                old_offset, length = previous[content_hash]
+                for chunk in _read_range(old, old_offset, old_offset + length):
+                    _check(pak_native.write_raw(df, chunk), "data set")
+                n_reused += 1
+            else:
+                data = _read_data_set(pak, ifile_obj, len(data_sets))
+                try:
+                    filtered = filter_function(data)
+                    length = pak_native.data_set_size(filtered)
+                    _check(pak_native.writeOneDataSet(df, filtered), "data set")
+                finally:
+                    # Drops the views of it registered by the filter
+                    _free_bin_pak_data(data, pak_native.freeBinPakData)
+            data_sets.append({"array": i_array, "hash": content_hash, "offset": offset, "length": length})
+            offset += length
+    return data_sets, n_reused
+
+# Filter ifile into ofile, reusing what the manifest says is still valid.
+# filter_function(BinPakData) returns the filtered data set (pointer or struct),
+# config is the config_hash of the filter configuration.
+# Returns (data sets reused, data sets filtered); nothing is written when the
+# output is already up to date.
+def process_incremental(ifile, ofile, filter_function, config):
+    manifest = load_manifest(ofile)
+    output_valid = (manifest is not None and manifest["config"] == config and os.path.exists(ofile)
+                    and _same_file(manifest["output"], ofile))
+    if output_valid and _same_file(manifest["input"], ifile):
+        return len(manifest["data_sets"]), 0
+
+    with PakMemmap(ifile, use_cache=False) as pak:
+        hashes = hash_data_sets(ifile, pak)
+        layout = (pak.n_data_arrays, [entry.array_index for entry in pak.entries], hashes)
+        if output_valid and layout == (manifest["n_data_arrays"], [d["array"] for d in manifest["data_sets"]],
+                                       [d["hash"] for d in manifest["data_sets"]]):
+            # Same content, the input file was only touched
+            manifest["input"] = file_key(ifile)
+            save_manifest(ofile, manifest)
+            return len(hashes), 0
+
+        previous = {d["hash"]: (d["offset"], d["length"]) for d in manifest["data_sets"]} if output_valid else {}
+
+        # The new output is written next to the old one, which still has to be
+        # readable for the data sets that are copied
+        tmp_path = f"{ofile}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)  # left over from an interrupted run, writes do not truncate
+        df, _ = pak_native.open_file(tmp_path, pak_native.WRITE)
+        if df < 0:
+            raise FileNotFoundError(f"Failed to open output file: {tmp_path}")
+        old = None
+        try:
+            with open(ifile, "rb") as ifile_obj:
+                old = open(ofile, "rb") if previous else None
+                data_sets, n_reused = _write_output(df, pak, ifile_obj, old, hashes, previous, filter_function)
+        except BaseException:
+            pak_native.closePakBinFile(df)
+            os.remove(tmp_path)
+            raise
+        finally:
+            if old is not None:
+                old.close()
+        pak_native.closePakBinFile(df)
+        os.replace(tmp_path, ofile)
+
+    save_manifest(ofile, {
+        "version": MANIFEST_VERSION, "config": config, "n_data_arrays": pak.n_data_arrays,
+        "input": file_key(ifile), "output": file_key(ofile), "data_sets": data_sets})
+    return n_reused, len(data_sets) - n_reused
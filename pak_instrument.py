@@ -0,0 +1,151 @@
+# Property of Whisper Aero
+
+#################################################################################
+# This file is an opt-in instrumentation layer for the py_* wrappers and the    #
+# conversion helpers in read_write.py. While it is enabled every call records   #
+# its wall time, the bytes it read or wrote, the samples it converted and the   #
+# peak memory allocated during the call (via tracemalloc, which sees NumPy      #
+# buffers but not memory malloc'd inside the DLL). When it is disabled the      #
+# wrappers only check one global and call straight through.                     #
+#                                                                               #
+# Enable from Python with pak_instrument.enable(), or for a whole run with the  #
+# environment variable PAK_INSTRUMENT=1 (PAK_INSTRUMENT=time skips the memory   #
+# tracing, which slows down every allocation). main.py prints the summary at    #
+# the end of a run when instrumentation is on.                                  #
+#################################################################################
+
+import collections
+import functools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+# One instrumented call. bytes and samples are 0 for calls that do not move
+# data, peak_bytes is None when memory tracing is off.
+CallRecord = collections.namedtuple("CallRecord", ["name", "seconds", "bytes", "samples", "peak_bytes"])
+
+# Totals per function name as returned by summary()
+CallSummary = collections.namedtuple("CallSummary", ["name", "calls", "seconds", "bytes", "samples", "peak_bytes"])
+
+
+class _Recorder:
+    def __init__(self, trace_memory):
+        self.trace_memory = trace_memory
+        self.records = []
+        self._lock = threading.Lock()
+        self._local = threading.local()  # stack of open calls, for nested peaks
+        self._started_tracing = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+
+    def call(self, name, function, args, kwargs, measure_bytes, measure_samples):
+        frame = None
+        if self.trace_memory:
+            # tracemalloc has a single peak, so a nested call resets it and hands
+            # the peak it saw back to the enclosing call when it finishes
+            stack = self._local.__dict__.setdefault("stack", [])
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+            frame = [current, 0]
+            stack.append(frame)
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            peak_bytes = None
+            if frame is not None:
+                peak = max(tracemalloc.get_traced_memory()[1], frame[1])
+                stack.pop()
+                if stack:
+                    stack[-1][1] = max(stack[-1][1], peak)
+                peak_bytes = max(peak - frame[0], 0)
+
+        record = CallRecord(name, seconds,
+                            measure_bytes(result, *args) if measure_bytes else 0,
+                            measure_samples(result, *args) if measure_samples else 0,
+                            peak_bytes)
+        with self._lock:
+            self.records.append(record)
+        return result
+
+
+_recorder = None
+
+
+def enable(trace_memory=True):
+    global _recorder
+    if _recorder is not None:
+        if _recorder.trace_memory == trace_memory:
+            return
+        disable()
+    _recorder = _Recorder(trace_memory)
+
+def disable():
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.stop()
+
+def is_enabled():
+    return _recorder is not None
+
+def reset():
+    if _recorder is not None:
+        with _recorder._lock:
+            _recorder.records.clear()
+
+def records():
+    if _recorder is None:
+        return []
+    with _recorder._lock:
+        return list(_recorder.records)
+
+# Totals per function, in order of first call
+def summary():
+    totals = {}
+    for record in records():
+        calls, seconds, n_bytes, samples, peak = totals.get(record.name, (0, 0.0, 0, 0, None))
+        if record.peak_bytes is not None:
+            peak = record.peak_bytes if peak is None else max(peak, record.peak_bytes)
+        totals[record.name] = (calls + 1, seconds + record.seconds, n_bytes + record.bytes,
+                               samples + record.samples, peak)
+    return [CallSummary(name, *values) for name, values in totals.items()]
+
+def format_summary():
+    lines = [f"{'function':<32}{'calls':>8}{'seconds':>12}{'bytes':>14}{'samples':>14}{'peak bytes':>14}"]
+    for row in summary():
+        peak = "-" if row.peak_bytes is None else row.peak_bytes
+        lines.append(f"{row.name:<32}{row.calls:>8}{row.seconds:>12.6f}{row.bytes:>14}{row.samples:>14}{peak:>14}")
+    return "\n".join(lines)
+
+def dump(file=None):
+    print(format_summary(), file=file if file is not None else sys.stderr)
+
+# Decorator for the functions to instrument. measure_bytes / measure_samples are
+# called as f(result, *args) after a successful call and return an int.
+def instrumented(measure_bytes=None, measure_samples=None):
+    def decorator(function):
+        name = function.__name__
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return function(*args, **kwargs)
+            return _recorder.call(name, function, args, kwargs, measure_bytes, measure_samples)
+        return wrapper
+    return decorator
+
+
+_mode = os.environ.get("PAK_INSTRUMENT", "").lower()
+if _mode not in ("", "0"):
+    enable(trace_memory=_mode != "time")
@@ -0,0 +1,248 @@
+# Property of Whisper Aero
+
+#################################################################################
+# This file provides random access to PAK binary files without reading them.    #
+# build_index makes one pass over the headers only (seeking past the values)    #
+# and records where every data set lives. PakMemmap maps the file with          #
+# np.memmap and hands out read-only ndarray views of any data set or channel on #
+# demand, so reading 3 channels out of 400 only touches those 3 channels.       #
+# The index is cached in a sidecar file (<file>.pakidx) next to the PAK file,   #
+# keyed by file size and mtime, so it is only rebuilt when the file changes.    #
+#################################################################################
+
+import collections
+import contextlib
+import os
+
+import numpy as np
+
+import pak_native
+
+# Location of one data set in the file. Offsets are in bytes from the start of
+# the file and point at the first value of the x, z and y blocks.
+DataSetEntry = collections.namedtuple("DataSetEntry", [
+    "array_index", "set_index", "name",
+    "x_cplx", "nx", "z_cplx", "nz", "y_cplx",
+    "x_offset", "z_offset", "y_offset", "end_offset"])
+
+DOUBLE_SIZE = 8
+
+# Sidecar index cache
+INDEX_SUFFIX = ".pakidx"
+INDEX_VERSION = 1
+INDEX_ENTRY_DTYPE = np.dtype([
+    ('array_index', '<i4'), ('set_index', '<i4'), ('name', 'S256'),
+    ('x_cplx', '<i2'), ('nx', '<i8'), ('z_cplx', '<i2'), ('nz', '<i8'), ('y_cplx', '<i2'),
+    ('x_offset', '<i8'), ('z_offset', '<i8'), ('y_offset', '<i8'), ('end_offset', '<i8')])
+
+
+def _read_record(fobj, dtype, filename):
+    raw = fobj.read(dtype.itemsize)
+    if len(raw) != dtype.itemsize:
+        raise ValueError(f"Unexpected end of file in {filename}")
+    return np.frombuffer(raw, dtype=dtype)[0]
+
+def _decode_name(raw):
+    return raw.split(b"\0", 1)[0].decode("utf-8", errors="replace")
+
+# Header-only pass over a PAK file.
+# Returns (byte order character, n_data_arrays, list of DataSetEntry)
+def build_index(filename):
+    file_size = os.path.getsize(filename)
+    with open(filename, "rb") as fobj:
+        raw = fobj.read(pak_native.FILE_HEADER_SIZE)
+        if len(raw) != pak_native.FILE_HEADER_SIZE:
+            raise ValueError(f"File too short for a PAK header: {filename}")
+        order = pak_native.BYTE_ORDERS.get(raw[:3])
+        if order is None:
+            raise ValueError(f"No valid byte order in PAK header: {filename}")
+        header = np.frombuffer(raw, dtype=pak_native.file_header_dtype(order))[0]
+        if header['version'] > pak_native.SUPPORTED_PAK_BIN_VERSION:
+            raise ValueError(f"Unsupported PAK bin file version {header['version']}: {filename}")
+
+        set_header_dtype = pak_native.data_set_header_dtype(order)
+        info_dtype = pak_native.data_info_dtype(order)
+
+        def skip_block(cplx, n_val):
+            start = fobj.tell()
+            end = start + int(cplx) * int(n_val) * DOUBLE_SIZE
+            if end > file_size:
+                raise ValueError(f"Data set extends past end of file: {filename}")
+            fobj.seek(end)
+            return start
+
+        entries = []
+        for i_array in range(int(header['nDataArrays'])):
+            n_data_sets = int(_read_record(fobj, set_header_dtype, filename)['nDataSets'])
+            for i_set in range(n_data_sets):
+                name = fobj.read(pak_native.NAME_SIZE)
+                if len(name) != pak_native.NAME_SIZE:
+                    raise ValueError(f"Unexpected end of file in {filename}")
+                x_info = _read_record(fobj, info_dtype, filename)
+                x_offset = skip_block(x_info['cplx'], x_info['lCnt'])
+                z_info = _read_record(fobj, info_dtype, filename)
+                z_offset = skip_block(z_info['cplx'], z_info['lCnt'])
+                y_info = _read_record(fobj, info_dtype, filename)
+                y_offset = skip_block(y_info['cplx'], int(x_info['lCnt']) * int(z_info['lCnt']))
+                entries.append(DataSetEntry(
+                    i_array, i_set, _decode_name(name),
+                    int(x_info['cplx']), int(x_info['lCnt']),
+                    int(z_info['cplx']), int(z_info['lCnt']), int(y_info['cplx']),
+                    x_offset, z_offset, y_offset, fobj.tell()))
+    return order, int(header['nDataArrays']), entries
+
+
+# ==================== SIDECAR FILES ====================
+# Shared by the sidecar files of other modules (.pakinc, .pakpyr)
+
+# (size, mtime in ns), sidecar files are only valid for the file they were made from
+def file_key(filename):
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime_ns
+
+# Write path through a temporary file that replaces it only once it is complete,
+# so readers never see a half written file
+@contextlib.contextmanager
+def atomic_write(path, mode="wb", **kwargs):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode, **kwargs) as fobj:
+            yield fobj
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# ==================== SIDECAR INDEX CACHE ====================
+def sidecar_path(filename):
+    return os.fspath(filename) + INDEX_SUFFIX
+
+def save_index(filename, index, key=None):
+    order, n_data_arrays, entries = index
+    size, mtime_ns = key if key is not None else file_key(filename)
+    table = np.zeros(len(entries), dtype=INDEX_ENTRY_DTYPE)
+    for i, entry in enumerate(entries):
+        table[i] = entry._replace(name=entry.name.encode("utf-8"))
+    meta = np.array([INDEX_VERSION, size, mtime_ns, n_data_arrays, ord(order)], dtype='<i8')
+
+    with atomic_write(sidecar_path(filename)) as fobj:
+        np.savez(fobj, meta=meta, entries=table)
+
+# Returns the cached index, or None if there is none or the file has changed
+def load_cached_index(filename):
+    try:
+        with np.load(sidecar_path(filename), allow_pickle=False) as cache:
+            meta = cache["meta"]
+            table = cache["entries"]
+    except (OSError, ValueError, KeyError):
+        return None
+    version, size, mtime_ns, n_data_arrays, order = (int(v) for v in meta)
+    if version != INDEX_VERSION or (size, mtime_ns) != file_key(filename):
+        return None
+    entries = [DataSetEntry(*(v.decode("utf-8") if isinstance(v, bytes) else int(v) for v in row.tolist()))
+               for row in table]
+    return chr(order), n_data_arrays, entries
+
+def load_index(filename, use_cache=True):
+    if not use_cache:
+        return build_index(filename)
+    index = load_cached_index(filename)
+    if index is None:
+        key = file_key(filename)
+        index = build_index(filename)
+        try:
+            save_index(filename, index, key)
+        except OSError:
+            pass  # read-only location, the index is simply rebuilt next time
+    return index
+
+
+# The index and the memory map are only set up on first use
+class PakMemmap:
+    def __init__(self, filename, use_cache=True):
+        self.filename = filename
+        self.use_cache = use_cache
+        self._index = None
+        self._by_name = None
+        self._mm = None
+
+    def _load_index(self):
+        if self._index is None:
+            self._index = load_index(self.filename, self.use_cache)
+        return self._index
+
+    @property
+    def order(self):
+        return self._load_index()[0]
+
+    @property
+    def n_data_arrays(self):
+        return self._load_index()[1]
+
+    @property
+    def entries(self):
+        return self._load_index()[2]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._mm = None
+
+    def names(self):
+        return [entry.name for entry in self.entries]
+
+    def find(self, name):
+        if self._by_name is None:
+            # First data set with a given name wins, like a lookup in the PAK tree
+            self._by_name = {}
+            for i, entry in enumerate(self.entries):
+                self._by_name.setdefault(entry.name, i)
+        try:
+            return self._by_name[name]
+        except KeyError:
+            raise KeyError(f"No data set named {name!r} in {self.filename}") from None
+
+    def _entry(self, key):
+        # Data sets can be addressed by position or by name
+        return self.entries[self.find(key) if isinstance(key, str) else key]
+
+    def _view(self, offset, shape):
+        if not int(np.prod(shape)):
+            return np.zeros(shape, dtype=np.float64)
+        if self._mm is None:
+            self._mm = np.memmap(self.filename, dtype=np.uint8, mode="r")
+        return np.ndarray(shape, dtype=self.order + "f8", buffer=self._mm, offset=offset)
+
+    # Read-only views in the byte order of the file. For MSB files on a little
+    # endian machine the views keep the '>f8' dtype, NumPy arithmetic works on
+    # them directly. native=True converts to a native order copy in one step.
+    def xdata(self, key, native=False):
+        entry = self._entry(key)
+        return self._maybe_native(self._view(entry.x_offset, (entry.nx * entry.x_cplx,)), native)
+
+    def zdata(self, key, native=False):
+        entry = self._entry(key)
+        return self._maybe_native(self._view(entry.z_offset, (entry.nz * entry.z_cplx,)), native)
+
+    def ydata(self, key, native=False):
+        entry = self._entry(key)
+        return self._maybe_native(self._view(entry.y_offset, (entry.nz, entry.nx * entry.y_cplx)), native)
+
+    @staticmethod
+    def _maybe_native(arr, native):
+        return pak_native.to_native_order(arr) if native else arr
+
+    # (x, y, z) views of one data set
+    def channel(self, key, native=False):
+        return self.xdata(key, native), self.ydata(key, native), self.zdata(key, native)
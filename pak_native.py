@@ -0,0 +1,523 @@
+# Property of Whisper Aero
+
+#################################################################################
+# This file is a pure Python/NumPy implementation of rw_data.c. It exposes the  #
+# same 16 functions, with the same names, arguments and return codes, as        #
+# pak_lib.dll so read_write.py can use it in place of the DLL on machines that  #
+# cannot load a Windows DLL (Linux processing nodes).                           #
+#                                                                               #
+# On-disk layout (PAK is a Windows program, so C long is 4 bytes in the file):  #
+#   file header      char byteOrder[8] ("LSB"/"MSB"), short version,            #
+#                    short nDataArrays, long pad                  -> 16 bytes   #
+#   data set header  long nDataSets, long pad                     ->  8 bytes   #
+#   per data set     char name[256]                                             #
+#                    info (short cplx, short pad, long lCnt) + nx*xCplx doubles #
+#                    info + nz*zCplx doubles                                    #
+#                    info (lCnt = 0) + nz rows of nx*yCplx doubles              #
+#################################################################################
+
+import ctypes
+import os
+import struct
+import sys
+
+import numpy as np
+
+from pak_struct import BinPakData, row_pointers
+
+READ = 1
+WRITE = 2
+
+SUPPORTED_PAK_BIN_VERSION = 1
+
+NAME_SIZE = 256
+
+# Byte order tags and the matching NumPy byte order characters
+BYTE_ORDERS = {b"LSB": "<", b"MSB": ">"}
+NATIVE_ORDER = "<" if sys.byteorder == "little" else ">"
+BYTE_ORDER_TAGS = {"<": b"LSB", ">": b"MSB"}
+
+
+# ========================== On-disk record layouts ===========================
+def file_header_dtype(order):
+    return np.dtype([('byteOrder', 'S8'), ('version', order + 'i2'),
+                     ('nDataArrays', order + 'i2'), ('pad', order + 'i4')])
+
+def data_set_header_dtype(order):
+    return np.dtype([('nDataSets', order + 'i4'), ('pad', order + 'i4')])
+
+def data_info_dtype(order):
+    return np.dtype([('cplx', order + 'i2'), ('pad', order + 'i2'), ('lCnt', order + 'i4')])
+
+FILE_HEADER_SIZE = file_header_dtype("<").itemsize
+DATA_SET_HEADER_SIZE = data_set_header_dtype("<").itemsize
+DATA_INFO_SIZE = data_info_dtype("<").itemsize
+DOUBLE_SIZE = 8
+
+# Data sets up to this size are assembled in a per-handle buffer and written
+# with a single write call. Bigger ones are written block by block, at that
+# size the number of calls no longer matters and a copy would double memory.
+WRITE_BUFFER_LIMIT = 64 << 20
+
+
+# Per open file state. rw_data.c keeps the byte order in a static variable, here
+# every descriptor remembers its own so LSB and MSB files can be open together.
+class _PakHandle:
+    def __init__(self, fobj, order, version):
+        self.fobj = fobj
+        self.order = order
+        self.version = version
+        self.write_buffer = bytearray()  # reused by writeOneDataSet / writeDataSetData
+
+_handles = {}
+
+
+# ========================== Supplementary functions ===========================
+def _deref(p_data):
+    # Accept POINTER(BinPakData), byref(BinPakData) or BinPakData like the DLL does
+    if p_data is None:
+        return None
+    if isinstance(p_data, BinPakData):
+        return p_data
+    if not p_data:
+        return None
+    # ctypes.cast is avoided where possible: its result references itself, which
+    # keeps the struct (and the buffers it points to) alive until the garbage
+    # collector runs instead of until the caller drops it
+    if isinstance(p_data, ctypes.POINTER(BinPakData)):
+        return p_data.contents
+    if isinstance(p_data, type(ctypes.byref(BinPakData()))) and isinstance(p_data._obj, BinPakData):
+        return p_data._obj
+    return ctypes.cast(p_data, ctypes.POINTER(BinPakData)).contents
+
+def _store(ref, ctype, value):
+    # Write an output parameter passed as byref(...) or POINTER(...)
+    ctypes.cast(ref, ctypes.POINTER(ctype))[0] = value
+
+def _value(arg):
+    # Accept both plain ints and ctypes simple types (c_short, c_long, ...)
+    return getattr(arg, "value", arg)
+
+def _read_exact(fobj, buf):
+    # Fill buf completely, the OS may return short reads for very large requests
+    view = memoryview(buf).cast("B")
+    n_total = 0
+    while n_total < len(view):
+        n = fobj.readinto(view[n_total:])
+        if not n:
+            break
+        n_total += n
+    return n_total == len(view)
+
+def _read_record(handle, dtype):
+    raw = handle.fobj.read(dtype.itemsize)
+    if len(raw) != dtype.itemsize:
+        return None
+    return np.frombuffer(raw, dtype=dtype)[0]
+
+def _write_bytes(handle, data):
+    view = memoryview(data).cast("B")
+    n_total = 0
+    while n_total < len(view):
+        n = handle.fobj.write(view[n_total:])
+        if not n:
+            return -1
+        n_total += n
+    return 0
+
+def _as_double_pointer(arr):
+    # ctypes keeps arr alive for as long as the returned pointer (or any struct
+    # field it is assigned to) is alive
+    return ctypes.cast(np.ctypeslib.as_ctypes(arr), ctypes.POINTER(ctypes.c_double))
+
+# count doubles at ptr (a ctypes pointer or array) as a NumPy view. ctypes.cast
+# is not used since its result references ptr in a cycle, which keeps the struct
+# ptr was read from alive until the garbage collector runs.
+def _values_at(ptr, count):
+    if isinstance(ptr, ctypes.Array):
+        address = ctypes.addressof(ptr)
+    elif isinstance(ptr, ctypes._Pointer):
+        address = ctypes.addressof(ptr.contents)
+    else:
+        address = ctypes.cast(ptr, ctypes.c_void_p).value
+    return np.ctypeslib.as_array((ctypes.c_double * count).from_address(address))
+
+def read_values(df, cplx, n_val):
+    # Read cplx * n_val doubles and return them as a native order float64 array
+    handle = _handles.get(df)
+    if handle is None:
+        return None
+    arr = np.empty(cplx * n_val, dtype=handle.order + "f8")
+    if not _read_exact(handle.fobj, arr):
+        return None
+    return to_native_order(arr)
+
+# Convert an array of file order doubles to native order in one vectorized step.
+# Writeable arrays are swapped in place (no second buffer), read-only ones such
+# as memory-mapped views are converted into a new array.
+def to_native_order(arr):
+    if arr.dtype.isnative:
+        return arr
+    if arr.flags.writeable:
+        return arr.byteswap(inplace=True).view(arr.dtype.newbyteorder("="))
+    return arr.astype(arr.dtype.newbyteorder("="))
+
+def write_raw(df, data):
+    # Write bytes that already are in PAK layout, e.g. a data set copied from another file
+    handle = _handles.get(df)
+    if handle is None:
+        return -1
+    return _write_bytes(handle, data)
+
+def write_values(df, values):
+    # Write a float64 array in the byte order announced by writePakBinFileHeader
+    handle = _handles.get(df)
+    if handle is None:
+        return -1
+    values = np.ascontiguousarray(values, dtype=handle.order + "f8")
+    if values.size == 0:
+        return 0
+    try:
+        values.tofile(handle.fobj)
+    except OSError:
+        return -1
+    return 0
+
+
+# ========================== File/Memory Handling ===========================
+def freeBinPakData(pData):
+    data = _deref(pData)
+    if data is None:
+        return None
+    # Dropping the pointers releases the NumPy buffers they keep alive
+    data.xdata = None
+    data.zdata = None
+    data.ydata = None
+    return None
+
+# Open a file and return (df, nDataArrays). df is negative on errors with the
+# same codes as openPakBinFile. Files opened for writing use write_order ("<" or
+# ">") for everything written to them; openPakBinFile uses the machine order.
+def open_file(filename, oMode, write_order=NATIVE_ORDER):
+    if isinstance(filename, bytes):
+        filename = os.fsdecode(filename)
+
+    # Evaluate opening mode of file
+    if oMode == READ:
+        open_mode = os.O_RDONLY
+    elif oMode == WRITE:
+        open_mode = os.O_WRONLY | os.O_CREAT
+    else:
+        return -1, 0
+    open_mode |= getattr(os, "O_BINARY", 0)
+
+    try:
+        df = os.open(filename, open_mode, 0o666)
+    except OSError:
+        return -1, 0
+    fobj = open(df, "rb" if oMode == READ else "wb", buffering=0)
+
+    if oMode == WRITE:
+        _handles[df] = _PakHandle(fobj, write_order, SUPPORTED_PAK_BIN_VERSION)
+        return df, 0
+
+    # ---> Read header of datafile and evaluate byte order
+    raw = fobj.read(FILE_HEADER_SIZE)
+    if len(raw) != FILE_HEADER_SIZE:
+        fobj.close()
+        return -1, 0
+    order = BYTE_ORDERS.get(raw[:3])
+    if order is None:
+        fobj.close()
+        return -3, 0
+
+    header = np.frombuffer(raw, dtype=file_header_dtype(order))[0]
+    version = int(header['version'])
+    if version > SUPPORTED_PAK_BIN_VERSION:
+        fobj.close()
+        return -2, 0
+
+    _handles[df] = _PakHandle(fobj, order, version)
+    return df, int(header['nDataArrays'])
+
+def openPakBinFile(filename, nDataArrays, oMode):
+    df, n_data_arrays = open_file(filename, oMode)
+    if df >= 0 and oMode == READ:
+        _store(nDataArrays, ctypes.c_short, n_data_arrays)
+    return df
+
+def closePakBinFile(df):
+    handle = _handles.pop(df, None)
+    if handle is not None:
+        handle.fobj.close()
+
+# Byte order ("<" or ">") and file version of an open handle
+def byte_order(df):
+    return _handles[df].order
+
+def file_version(df):
+    return _handles[df].version
+
+
+# ==================== READS ====================
+def readDataSetHeader(df, nDataSets):
+    handle = _handles.get(df)
+    if handle is None:
+        return -1
+    header = _read_record(handle, data_set_header_dtype(handle.order))
+    if header is None:
+        return -1
+    _store(nDataSets, ctypes.c_long, int(header['nDataSets']))
+    return 0
+
+def readDataSetName(df, dsName):
+    handle = _handles.get(df)
+    if handle is None:
+        return -1
+    raw = handle.fobj.read(NAME_SIZE)
+    if len(raw) != NAME_SIZE:
+        return -1
+    ctypes.memmove(dsName, raw, NAME_SIZE)
+    return 0
+
+def readDataSetDataInfo(df, cplx, nVal):
+    handle = _handles.get(df)
+    if handle is None:
+        return -1
+    info = _read_record(handle, data_info_dtype(handle.order))
+    if info is None:
+        return -1
+    _store(cplx, ctypes.c_int, int(info['cplx']))
+    _store(nVal, ctypes.c_long, int(info['lCnt']))
+    return 0
+
+def readDataSetDataValues(df, cplx, nVal):
+    values = read_values(df, _value(cplx), _value(nVal))
+    if values is None:
+        return ctypes.POINTER(ctypes.c_double)()
+    return _as_double_pointer(values)
+
+def readDataSetData(df):
+    p_data = ctypes.pointer(BinPakData())
+    data = p_data.contents
+    x_cplx, nx, z_cplx, nz, y_cplx, dummy = (ctypes.c_int(), ctypes.c_long(), ctypes.c_int(),
+                                             ctypes.c_long(), ctypes.c_int(), ctypes.c_long())
+
+    # ====> X-DATA
+    if readDataSetDataInfo(df, ctypes.byref(x_cplx), ctypes.byref(nx)) < 0:
+        return ctypes.POINTER(BinPakData)()
+    xdata = read_values(df, x_cplx.value, nx.value)
+    if xdata is None:
+        return ctypes.POINTER(BinPakData)()
+
+    # ====> Z-DATA
+    if readDataSetDataInfo(df, ctypes.byref(z_cplx), ctypes.byref(nz)) < 0:
+        return ctypes.POINTER(BinPakData)()
+    zdata = read_values(df, z_cplx.value, nz.value)
+    if zdata is None:
+        return ctypes.POINTER(BinPakData)()
+
+    # ====> Y-DATA (nz rows of nx * yCplx values, lCnt of the info block is unused)
+    # The rows are stored back to back, so they are read as one contiguous block
+    # and the row pointers alias into it
+    if readDataSetDataInfo(df, ctypes.byref(y_cplx), ctypes.byref(dummy)) < 0:
+        return ctypes.POINTER(BinPakData)()
+    ydata = read_values(df, y_cplx.value, nx.value * nz.value)
+    if ydata is None:
+        return ctypes.POINTER(BinPakData)()
+    rows = row_pointers(ydata.reshape(nz.value, y_cplx.value * nx.value))
+
+    # ctypes arrays assigned to the pointer fields keep the NumPy buffers alive
+    # with the struct, and are released as soon as freeBinPakData drops them
+    data.xCplx, data.nx, data.xdata = x_cplx.value, nx.value, np.ctypeslib.as_ctypes(xdata)
+    data.zCplx, data.nz, data.zdata = z_cplx.value, nz.value, np.ctypeslib.as_ctypes(zdata)
+    data.yCplx = y_cplx.value
+    data.ydata = rows
+    return p_data
+
+def readOneDataSet(df):
+    name_buff = ctypes.create_string_buffer(NAME_SIZE)
+    if readDataSetName(df, name_buff) < 0:
+        return ctypes.POINTER(BinPakData)()
+    p_data = readDataSetData(df)
+    if p_data:
+        p_data.contents.name = name_buff.value
+    return p_data
+
+
+# ==================== WRITES ====================
+def writePakBinFileHeader(df, nDataArrays):
+    handle = _handles.get(df)
+    if handle is None:
+        return -1
+    header = np.zeros(1, dtype=file_header_dtype(handle.order))
+    header['byteOrder'] = BYTE_ORDER_TAGS[handle.order]
+    header['version'] = SUPPORTED_PAK_BIN_VERSION
+    header['nDataArrays'] = _value(nDataArrays)
+    return _write_bytes(handle, header)
+
+def writeDataSetHeader(df, nDataSets):
+    handle = _handles.get(df)
+    if handle is None:
+        return -1
+    header = np.zeros(1, dtype=data_set_header_dtype(handle.order))
+    header['nDataSets'] = _value(nDataSets)
+    return _write_bytes(handle, header)
+
+def _name_record(dsName):
+    # Name padded with zeros to NAME_SIZE, None if it does not fit
+    if isinstance(dsName, str):
+        dsName = dsName.encode('utf-8')
+    dsName = bytes(dsName).split(b"\0", 1)[0]
+    if len(dsName) > NAME_SIZE - 1:
+        return None
+    return dsName.ljust(NAME_SIZE, b"\0")
+
+def writeDataSetName(df, dsName):
+    handle = _handles.get(df)
+    if handle is None or dsName is None:
+        return -1
+    name = _name_record(dsName)
+    if name is None:
+        return -1
+    return _write_bytes(handle, name)
+
+def writeDataSetDataInfo(df, cplx, nVal):
+    handle = _handles.get(df)
+    if handle is None:
+        return -1
+    info = np.zeros(1, dtype=data_info_dtype(handle.order))
+    info['cplx'] = _value(cplx)
+    info['lCnt'] = _value(nVal)
+    return _write_bytes(handle, info)
+
+def writeDataSetDataValues(df, cplx, nVal, data):
+    if not data:
+        return -1
+    count = _value(cplx) * _value(nVal)
+    if count == 0:
+        return 0
+    return write_values(df, _values_at(data, count))
+
+def writeDataSetData(df, pData):
+    data = _deref(pData)
+    if data is None:
+        return -1
+    handle = _handles.get(df)
+    if handle is not None and data_set_size(data, False) <= WRITE_BUFFER_LIMIT:
+        return _write_packed(handle, data, None)
+
+    # ====> X-DATA
+    if writeDataSetDataInfo(df, data.xCplx, data.nx) < 0:
+        return -1
+    if writeDataSetDataValues(df, data.xCplx, data.nx, data.xdata) < 0:
+        return -1
+
+    # ====> Z-DATA
+    if writeDataSetDataInfo(df, data.zCplx, data.nz) < 0:
+        return -1
+    if writeDataSetDataValues(df, data.zCplx, data.nz, data.zdata) < 0:
+        return -1
+
+    # ====> Y-DATA
+    if writeDataSetDataInfo(df, data.yCplx, 0) < 0:
+        return -1
+    if not data.ydata:
+        return -1
+    for i in range(data.nz):
+        if writeDataSetDataValues(df, data.yCplx, data.nx, data.ydata[i]) < 0:
+            return -1
+    return 0
+
+def writeOneDataSet(df, pData):
+    data = _deref(pData)
+    if data is None:
+        return -1
+    handle = _handles.get(df)
+    if handle is not None and data_set_size(data, True) <= WRITE_BUFFER_LIMIT:
+        return _write_packed(handle, data, data.name)
+    ret = writeDataSetName(df, data.name)
+    if ret >= 0:
+        ret = writeDataSetData(df, data)
+    return ret
+
+
+# ==================== BUFFERED WRITES ====================
+# rw_data.c writes the name, every info block and every ydata row with its own
+# write call, which adds up for files with thousands of small data sets. The
+# functions below lay out a whole data set (name, the three info blocks and all
+# values) in the handle's reusable buffer and write it with one call. The bytes
+# are exactly those the unbuffered functions above produce.
+_INFO_STRUCTS = {order: struct.Struct(order + "hhi") for order in BYTE_ORDER_TAGS}
+
+# Bytes writeOneDataSet (with_name) or writeDataSetData writes for a data set
+def data_set_size(data, with_name=True):
+    data = _deref(data)
+    n_values = data.xCplx * data.nx + data.zCplx * data.nz + data.yCplx * data.nx * data.nz
+    return (NAME_SIZE if with_name else 0) + 3 * DATA_INFO_SIZE + n_values * DOUBLE_SIZE
+
+class _Packer:
+    def __init__(self, handle, size):
+        if len(handle.write_buffer) < size:
+            handle.write_buffer = bytearray(size)
+        self.buffer = handle.write_buffer
+        self.address = ctypes.addressof(ctypes.c_char.from_buffer(self.buffer))
+        self.order = handle.order
+        self.info = _INFO_STRUCTS[handle.order]
+        self.offset = 0
+
+    def bytes(self, data):
+        self.buffer[self.offset:self.offset + len(data)] = data
+        self.offset += len(data)
+
+    def info_block(self, cplx, n_val):
+        self.info.pack_into(self.buffer, self.offset, cplx, 0, n_val)
+        self.offset += DATA_INFO_SIZE
+
+    def values(self, ptr, count):
+        if not count:
+            return
+        if self.order == NATIVE_ORDER:
+            ctypes.memmove(self.address + self.offset, ptr, count * DOUBLE_SIZE)
+        else:
+            np.frombuffer(self.buffer, dtype=self.order + "f8", count=count, offset=self.offset)[:] = _values_at(ptr, count)
+        self.offset += count * DOUBLE_SIZE
+
+def _write_packed(handle, data, name):
+    # Same checks, in the same order, as the unbuffered path
+    if name is not None:
+        name = _name_record(name)
+        if name is None:
+            return -1
+    if not data.xdata or not data.zdata or not data.ydata:
+        return -1
+
+    size = data_set_size(data, name is not None)
+    packer = _Packer(handle, size)
+    if name is not None:
+        packer.bytes(name)
+
+    # ====> X-DATA
+    packer.info_block(data.xCplx, data.nx)
+    packer.values(data.xdata, data.xCplx * data.nx)
+
+    # ====> Z-DATA
+    packer.info_block(data.zCplx, data.nz)
+    packer.values(data.zdata, data.zCplx * data.nz)
+
+    # ====> Y-DATA
+    packer.info_block(data.yCplx, 0)
+    row_len = data.yCplx * data.nx
+    if data.nz > 1 and row_len:
+        rows = np.ctypeslib.as_array((ctypes.c_size_t * data.nz).from_address(ctypes.addressof(data.ydata.contents)))
+        contiguous = bool(np.all(np.diff(rows) == row_len * DOUBLE_SIZE))
+    else:
+        contiguous = True
+    if contiguous:
+        # Rows back to back in memory (native engine, copy_bin_data): one copy
+        packer.values(data.ydata[0], data.nz * row_len)
+    else:
+        for i in range(data.nz):
+            packer.values(data.ydata[i], row_len)
+
+    return _write_bytes(handle, memoryview(packer.buffer)[:size])
@@ -0,0 +1,131 @@
+# Property of Whisper Aero
+
+#################################################################################
+# This file runs read -> filter -> write as a three stage pipeline so the disk  #
+# and the CPU are busy at the same time. A reader thread prefetches the next    #
+# data sets while the calling thread filters the current one, and a writer      #
+# thread writes finished data sets in the order they were read. At most         #
+# max_in_flight data sets are alive at any time (read and not yet written and   #
+# released), which caps the memory used by the pipeline.                        #
+#################################################################################
+
+import queue
+import threading
+
+DEFAULT_MAX_IN_FLIGHT = 3  # one being read, one being filtered, one being written
+
+_DONE = object()
+_POLL_SECONDS = 0.05
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+# source:  iterable of items, iterated in the reader thread
+# stage:   stage(item) -> result, called in the calling thread, in order
+# sink:    sink(iterable of results), runs in the writer thread
+# release: release(item, result) is called once the sink has moved past a result
+#          (result is None for items that were never filtered after an error)
+# Errors in any stage stop the pipeline and are raised in the calling thread.
+def run_pipeline(source, stage, sink, release=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    if max_in_flight < 1:
+        raise ValueError(f"max_in_flight must be at least 1, got {max_in_flight}")
+    slots = threading.Semaphore(max_in_flight)
+    stop = threading.Event()
+    read_queue = queue.Queue()
+    write_queue = queue.Queue()
+    writer_errors = []
+
+    def release_item(item, result):
+        if release is not None:
+            release(item, result)
+
+    def wait_for_slot():
+        while not stop.is_set():
+            if slots.acquire(timeout=_POLL_SECONDS):
+                return True
+        return False
+
+    def reader():
+        items = iter(source)
+        try:
+            while wait_for_slot():
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                read_queue.put(item)
+            read_queue.put(_DONE)
+        except BaseException as e:
+            read_queue.put(_Failure(e))
+        finally:
+            # Generators are closed in the thread that ran them
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+
+    def results():
+        while True:
+            entry = write_queue.get()
+            if entry is _DONE:
+                return
+            item, result = entry
+            try:
+                yield result
+            finally:
+                release_item(item, result)
+                slots.release()
+
+    def writer():
+        pending = results()
+        try:
+            sink(pending)
+        except BaseException as e:
+            writer_errors.append(e)
+        finally:
+            pending.close()  # releases the result the sink stopped at
+            stop.set()       # the sink will not take anything else
+
+    threads = [threading.Thread(target=reader, name="pak-reader", daemon=True),
+               threading.Thread(target=writer, name="pak-writer", daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = read_queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            if stop.is_set():
+                release_item(item, None)  # the writer failed, only drain
+                continue
+            try:
+                result = stage(item)
+            except BaseException:
+                release_item(item, None)
+                raise
+            write_queue.put((item, result))
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        write_queue.put(_DONE)
+        for thread in threads:
+            thread.join()
+        # Whatever is left was never written
+        for leftover in (read_queue, write_queue):
+            while not leftover.empty():
+                entry = leftover.get_nowait()
+                if entry is _DONE or isinstance(entry, _Failure):
+                    continue
+                if leftover is read_queue:
+                    release_item(entry, None)
+                else:
+                    release_item(*entry)
+
+    if writer_errors:
+        raise writer_errors[0]
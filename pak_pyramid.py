@@ -0,0 +1,211 @@
+# Property of Whisper Aero
+
+#################################################################################
+# This file builds and queries min/max (envelope) pyramids for fast plotting of #
+# huge channels. For every data set and every ydata row, level L holds the min  #
+# and max of each run of 2**L samples, for L = base_level, base_level + 1, ...  #
+# until one bin is left. The pyramid is stored next to the PAK file             #
+# (<file>.pakpyr) and is about 4 / 2**base_level the size of the ydata.         #
+#                                                                               #
+# envelope() picks the coarsest level that still gives at least `width` bins    #
+# for an x-range, so drawing any range of any channel reads about `width` bins  #
+# instead of the samples. Levels below base_level are computed on the fly from  #
+# the few samples they cover. Complex ydata is summarized by its magnitude.     #
+#                                                                               #
+# Usage: python pak_pyramid.py <file.bin> [base_level]                          #
+#################################################################################
+
+import collections
+import json
+import os
+import sys
+
+import numpy as np
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from pak_mmap import PakMemmap, atomic_write, file_key
+
+PYRAMID_SUFFIX = ".pakpyr"
+PYRAMID_MAGIC = b"PAKPYR01"
+PYRAMID_VERSION = 1
+
+DEFAULT_BASE_LEVEL = 4            # 16 samples per bin in the first stored level
+BUILD_CHUNK_SIZE = 1 << 22        # values (all rows together) read at a time while building
+
+# level 0 means the samples themselves (y_min == y_max), x is the x value of the
+# first sample of every bin
+Envelope = collections.namedtuple("Envelope", ["level", "x", "y_min", "y_max"])
+
+
+def pyramid_path(filename):
+    return os.fspath(filename) + PYRAMID_SUFFIX
+
+# (nz, n) real values of a data set, the magnitude for complex ydata
+def _y_values(y, y_cplx):
+    if y_cplx == 2:
+        pairs = y.reshape(y.shape[0], -1, 2)
+        return np.hypot(pairs[..., 0], pairs[..., 1])
+    return y
+
+# min/max over runs of `size` samples along the last axis, the last run may be short
+def _reduce(values, size):
+    n = values.shape[-1]
+    n_full = n - n % size
+    full = values[..., :n_full].reshape(values.shape[:-1] + (-1, size))
+    mins, maxs = full.min(axis=-1), full.max(axis=-1)
+    if n_full < n:
+        tail = values[..., n_full:]
+        mins = np.concatenate((mins, tail.min(axis=-1, keepdims=True)), axis=-1)
+        maxs = np.concatenate((maxs, tail.max(axis=-1, keepdims=True)), axis=-1)
+    return mins, maxs
+
+# Next level: pairs of bins, an odd last bin is carried over as it is
+def _halve(mins, maxs):
+    n_even = mins.shape[-1] - mins.shape[-1] % 2
+    new_mins = np.minimum(mins[..., 0:n_even:2], mins[..., 1:n_even:2])
+    new_maxs = np.maximum(maxs[..., 0:n_even:2], maxs[..., 1:n_even:2])
+    if n_even < mins.shape[-1]:
+        new_mins = np.concatenate((new_mins, mins[..., -1:]), axis=-1)
+        new_maxs = np.concatenate((new_maxs, maxs[..., -1:]), axis=-1)
+    return new_mins, new_maxs
+
+def _base_level(y, y_cplx, bin_size):
+    # Chunks span every row, so they are sized from the values of all rows, and
+    # are a whole number of bins so every bin is reduced in one piece
+    chunk = max(BUILD_CHUNK_SIZE // (max(y.shape[0], 1) * y_cplx * bin_size), 1) * bin_size
+    samples = y.shape[-1] // y_cplx
+    parts = [_reduce(_y_values(y[:, start * y_cplx:(start + chunk) * y_cplx], y_cplx), bin_size)
+             for start in range(0, samples, chunk)]
+    return np.concatenate([p[0] for p in parts], axis=-1), np.concatenate([p[1] for p in parts], axis=-1)
+
+# Build the pyramid of every data set of a PAK file and write it next to it.
+# Layout: magic, the levels as little endian doubles, a JSON header describing
+# them and the length of the header. Levels are written as they are computed,
+# so only one data set's pyramid is in memory at a time.
+def build_pyramid(filename, base_level=DEFAULT_BASE_LEVEL):
+    path = pyramid_path(filename)
+    source = file_key(filename)
+    data_sets = []
+    offset = 0
+    with atomic_write(path) as fobj, PakMemmap(filename, use_cache=False) as pak:
+        fobj.write(PYRAMID_MAGIC)
+        for i, entry in enumerate(pak.entries):
+            levels = []
+            if entry.nx and entry.nz:
+                mins, maxs = _base_level(pak.ydata(i), entry.y_cplx, 1 << base_level)
+                level = base_level
+                while True:
+                    block = np.stack((mins, maxs), axis=-1).astype("<f8")  # (nz, bins, 2)
+                    block.tofile(fobj)
+                    levels.append({"level": level, "bins": block.shape[1], "offset": offset})
+                    offset += block.size
+                    if block.shape[1] <= 1:
+                        break
+                    mins, maxs = _halve(mins, maxs)
+                    level += 1
+            data_sets.append({"name": entry.name, "nz": entry.nz, "nx": entry.nx, "levels": levels})
+
+        header = json.dumps({"version": PYRAMID_VERSION, "source": source, "base_level": base_level,
+                             "values": offset, "data_sets": data_sets}).encode("utf-8")
+        fobj.write(header)
+        fobj.write(np.array([len(header)], dtype="<u8").tobytes())
+    return path
+
+def _read_header(path):
+    with open(path, "rb") as fobj:
+        if fobj.read(len(PYRAMID_MAGIC)) != PYRAMID_MAGIC:
+            raise ValueError(f"Not a PAK pyramid file: {path}")
+        fobj.seek(-8, os.SEEK_END)
+        length = int(np.frombuffer(fobj.read(8), dtype="<u8")[0])
+        fobj.seek(-8 - length, os.SEEK_END)
+        header = json.loads(fobj.read(length))
+    if header.get("version") != PYRAMID_VERSION:
+        raise ValueError(f"Unsupported PAK pyramid version in {path}")
+    return header
+
+
+# Envelope queries on a PAK file. The pyramid is (re)built when it is missing or
+# older than the PAK file, unless build=False, then a stale pyramid raises.
+class PakPyramid:
+    def __init__(self, filename, build=True, base_level=DEFAULT_BASE_LEVEL):
+        self.filename = filename
+        path = pyramid_path(filename)
+        header = _read_header(path) if os.path.exists(path) else None
+        if header is None or tuple(header["source"]) != file_key(filename):
+            if not build:
+                raise ValueError(f"Pyramid of {filename} is missing or out of date")
+            build_pyramid(filename, base_level)
+            header = _read_header(path)
+        self.base_level = header["base_level"]
+        self.data_sets = header["data_sets"]
+        self._values = np.memmap(path, dtype="<f8", mode="r", offset=len(PYRAMID_MAGIC), shape=(header["values"],)) \
+            if header["values"] else np.zeros(0)
+        self.pak = PakMemmap(filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._values = None
+        self.pak.close()
+
+    def _index(self, key):
+        return self.pak.find(key) if isinstance(key, str) else key
+
+    # Stored level of a data set as (nz, bins, 2) [min, max] values
+    def level(self, key, level):
+        for stored in self.data_sets[self._index(key)]["levels"]:
+            if stored["level"] == level:
+                nz = self.data_sets[self._index(key)]["nz"]
+                size = nz * stored["bins"] * 2
+                return self._values[stored["offset"]:stored["offset"] + size].reshape(nz, stored["bins"], 2)
+        raise KeyError(f"No level {level} in the pyramid of data set {key!r}")
+
+    # Envelope of ydata row `row` for x_start <= x < x_end (x ascending) with at
+    # least `width` bins where the data has them (about width to 2 * width)
+    def envelope(self, key, x_start, x_end, width, row=0):
+        index = self._index(key)
+        entry = self.pak.entries[index]
+        if entry.x_cplx != 1:
+            raise ValueError("Envelopes need a real x axis")
+        x = self.pak.xdata(index)
+        i_start = int(np.searchsorted(x, x_start, side="left"))
+        i_end = int(np.searchsorted(x, x_end, side="left"))
+        if i_end <= i_start:
+            empty = np.zeros(0)
+            return Envelope(0, empty, empty, empty)
+
+        level = max(int(np.floor(np.log2((i_end - i_start) / max(width, 1)))), 0)
+        levels = self.data_sets[index]["levels"]
+        if levels:
+            level = min(level, levels[-1]["level"])
+        size = 1 << level
+        bin_start, bin_end = i_start >> level, -(-i_end // size)
+        x_bins = x[bin_start * size:bin_end * size:size].astype(np.float64)
+
+        if level >= self.base_level:
+            values = self.level(index, level)[row, bin_start:bin_end]
+            return Envelope(level, x_bins, values[:, 0].copy(), values[:, 1].copy())
+
+        # Few enough samples to reduce them directly
+        y = self.pak.ydata(index)[row:row + 1, bin_start * size * entry.y_cplx:bin_end * size * entry.y_cplx]
+        y = _y_values(y, entry.y_cplx).astype(np.float64)
+        if level == 0:
+            return Envelope(0, x_bins, y[0], y[0].copy())
+        mins, maxs = _reduce(y, size)
+        return Envelope(level, x_bins, mins[0], maxs[0])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("[ERROR] Usage: python pak_pyramid.py <file.bin> [base_level]")
+        sys.exit(1)
+    try:
+        print(build_pyramid(sys.argv[1], int(sys.argv[2]) if len(sys.argv) == 3 else DEFAULT_BASE_LEVEL))
+    except Exception as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
@@ -0,0 +1,142 @@
+# Property of Whisper Aero
+
+#################################################################################
+# This file filters PAK files block by block for channels larger than RAM. The  #
+# x and y values are read from the input in chunks of chunk_size samples, each  #
+# chunk is filtered together with a halo of neighbouring samples on both sides  #
+# (overlap-save) and written to the output straight away. As long as the halo   #
+# covers the reach of the filter the result is identical to filtering the       #
+# whole array at once, and memory use depends on chunk_size only.               #
+#                                                                               #
+# Usage: python pak_stream.py <input_file.bin> <output_file.bin> [chunk_size]   #
+#################################################################################
+
+import ctypes
+import os
+import sys
+
+import numpy as np
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+import pak_native
+from my_function import apply_gaussian_filter
+
+READ_MODE = 1
+WRITE_MODE = 2
+
+DEFAULT_CHUNK_SIZE = 1 << 20   # samples per chunk
+
+# Number of neighbouring samples gaussian_filter1d looks at on each side
+def gaussian_halo(sigma, truncate=4.0):
+    return int(truncate * float(sigma) + 0.5)
+
+# Filter a sequentially read array of n samples chunk by chunk.
+# read(count) must return the next count samples as an array of shape (count, ...)
+# and filter_function must filter along axis 0. Yields the filtered chunks in order.
+def iter_filtered_chunks(read, n, filter_function, halo, chunk_size=DEFAULT_CHUNK_SIZE):
+    buf = None
+    buf_start = 0    # sample index of buf[0]
+    n_read = 0
+    out_start = 0
+    while out_start < n:
+        out_end = min(out_start + chunk_size, n)
+        need_end = min(out_end + halo, n)
+        if need_end > n_read:
+            new = read(need_end - n_read)
+            buf = new if buf is None else np.concatenate((buf, new))
+            n_read = need_end
+        seg_start = max(out_start - halo, 0)
+        buf = buf[seg_start - buf_start:]
+        buf_start = seg_start
+        filtered = filter_function(buf)
+        yield filtered[out_start - seg_start:out_end - seg_start]
+        out_start = out_end
+
+def _read_info(df):
+    cplx, n_val = ctypes.c_int(), ctypes.c_long()
+    if pak_native.readDataSetDataInfo(df, ctypes.byref(cplx), ctypes.byref(n_val)) < 0:
+        raise RuntimeError("Failed to read data info")
+    return cplx.value, n_val.value
+
+def _check_write(ret, what):
+    if ret < 0:
+        raise RuntimeError(f"Failed to write {what}")
+
+def _write_info(df, cplx, n_val):
+    _check_write(pak_native.writeDataSetDataInfo(df, cplx, n_val), "data info")
+
+def _reader(df, cplx):
+    # Complex values are kept as (re, im) pairs so a chunk never splits a sample
+    def read(count):
+        values = pak_native.read_values(df, cplx, count)
+        if values is None:
+            raise RuntimeError("Unexpected end of file")
+        return values.reshape(count, cplx)
+    return read
+
+def _stream_block(df_i, df_o, cplx, n, filter_function, halo, chunk_size):
+    for chunk in iter_filtered_chunks(_reader(df_i, cplx), n, filter_function, halo, chunk_size):
+        _check_write(pak_native.write_values(df_o, chunk), "data values")
+
+# Filter every data set of ifile into ofile. x and y are streamed in chunks, z is
+# small and is filtered in one go. The default filter is the one used in main.py.
+def stream_filter_file(ifile, ofile, chunk_size=DEFAULT_CHUNK_SIZE, filter_function=None, halo=None):
+    if filter_function is None:
+        filter_function = lambda arr: apply_gaussian_filter(arr, axis=0)
+        halo = gaussian_halo(2)
+    if halo is None:
+        raise ValueError("halo must be given for a custom filter_function")
+
+    df_i, n_data_arrays = pak_native.open_file(ifile, READ_MODE)
+    if df_i < 0:
+        raise FileNotFoundError(f"Failed to open input file: {ifile}")
+    try:
+        df_o, _ = pak_native.open_file(ofile, WRITE_MODE)
+        if df_o < 0:
+            raise FileNotFoundError(f"Failed to open output file: {ofile}")
+        try:
+            _check_write(pak_native.writePakBinFileHeader(df_o, n_data_arrays), "PAK bin file header")
+            n_data_sets = ctypes.c_long()
+            name = ctypes.create_string_buffer(pak_native.NAME_SIZE)
+            for _ in range(n_data_arrays):
+                if pak_native.readDataSetHeader(df_i, ctypes.byref(n_data_sets)) < 0:
+                    raise RuntimeError("Failed to read data set header")
+                _check_write(pak_native.writeDataSetHeader(df_o, n_data_sets), "data set header")
+                for _ in range(n_data_sets.value):
+                    if pak_native.readDataSetName(df_i, name) < 0:
+                        raise RuntimeError("Failed to read data set name")
+                    _check_write(pak_native.writeDataSetName(df_o, name.value), "data set name")
+
+                    # X DATA
+                    x_cplx, nx = _read_info(df_i)
+                    _write_info(df_o, x_cplx, nx)
+                    _stream_block(df_i, df_o, x_cplx, nx, filter_function, halo, chunk_size)
+
+                    # Z DATA
+                    z_cplx, nz = _read_info(df_i)
+                    _write_info(df_o, z_cplx, nz)
+                    z_values = _reader(df_i, z_cplx)(nz)
+                    _check_write(pak_native.write_values(df_o, filter_function(z_values) if nz else z_values),
+                                 "data values")
+
+                    # Y DATA, nz rows of nx samples each
+                    y_cplx, _ = _read_info(df_i)
+                    _write_info(df_o, y_cplx, 0)
+                    for _ in range(nz):
+                        _stream_block(df_i, df_o, y_cplx, nx, filter_function, halo, chunk_size)
+        finally:
+            pak_native.closePakBinFile(df_o)
+    finally:
+        pak_native.closePakBinFile(df_i)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print("[ERROR] Usage: python pak_stream.py <input_file.bin> <output_file.bin> [chunk_size]")
+        sys.exit(1)
+    try:
+        stream_filter_file(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else DEFAULT_CHUNK_SIZE)
+    except Exception as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
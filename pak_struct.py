@@ -0,0 +1,40 @@
+# Property of Whisper Aero
+
+#################################################################################
+# This file holds the ctypes mirror of struct binPakData from rw_data.h. It is  #
+# shared by read_write.py and by the pure Python engine in pak_native.py so     #
+# both engines hand out exactly the same structure.                             #
+#################################################################################
+
+import ctypes
+
+import numpy as np
+
+# Mirrors structure from rw_data.c
+class BinPakData(ctypes.Structure):
+    _fields_ = [
+        ('name', ctypes.c_char * 256),                              # char name[256]
+        ('xCplx', ctypes.c_int),                                    # int xCplx
+        ('nx', ctypes.c_long),                                      # long nx
+        ('xdata', ctypes.POINTER(ctypes.c_double)),                 # double *xdata
+        ('zCplx', ctypes.c_int),                                    # int zCplx
+        ('nz', ctypes.c_long),                                      # long nz
+        ('zdata', ctypes.POINTER(ctypes.c_double)),                 # double *zdata
+        ('yCplx', ctypes.c_int),                                    # int yCplx
+        ('ydata', ctypes.POINTER(ctypes.POINTER(ctypes.c_double)))  # double **ydata
+    ]
+
+
+# Build the double* row table for BinPakData.ydata. Every entry aliases one row
+# of the 2-D array y_rows, so all nz rows live in one contiguous allocation. The
+# table keeps y_rows alive for as long as it (or the struct it is assigned to) lives.
+def row_pointers(y_rows):
+    n_rows = y_rows.shape[0]
+    row_ptrs = (ctypes.POINTER(ctypes.c_double) * n_rows)()
+    if n_rows:
+        # from_buffer instead of ctypes.cast, which links both objects in a reference
+        # cycle and keeps y_rows alive until the garbage collector runs
+        addresses = np.ctypeslib.as_array((ctypes.c_size_t * n_rows).from_buffer(row_ptrs))
+        addresses[:] = y_rows.ctypes.data + np.arange(n_rows, dtype=np.intp) * y_rows.strides[0]  # strides may be negative
+    row_ptrs._pak_buffer = y_rows
+    return row_ptrs
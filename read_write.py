@@ -13,103 +13,163 @@
 import ctypes
 import os
 import sys
+import threading
+import warnings
+import weakref
 import numpy as np
 
-# Mirrors structure from rw_data.c
-class BinPakData(ctypes.Structure):
-    _fields_ = [
-        ('name', ctypes.c_char * 256),                              # char name[256]
-        ('xCplx', ctypes.c_int),                                    # int xCplx
-        ('nx', ctypes.c_long),                                      # long nx
-        ('xdata', ctypes.POINTER(ctypes.c_double)),                 # double *xdata
-        ('zCplx', ctypes.c_int),                                    # int zCplx
-        ('nz', ctypes.c_long),                                      # long nz
-        ('zdata', ctypes.POINTER(ctypes.c_double)),                 # double *zdata
-        ('yCplx', ctypes.c_int),                                    # int yCplx
-        ('ydata', ctypes.POINTER(ctypes.POINTER(ctypes.c_double)))  # double **ydata
-    ]
-
+import pak_native
+from pak_instrument import instrumented
+from pak_struct import BinPakData, row_pointers
 
 # Load DLL
 # Base path is root directory and is joined with dll_path
 # If you change file structure, you may need to change this
+# If the DLL cannot be loaded (e.g. on Linux) or PAK_ENGINE=native is set, the
+# pure Python engine in pak_native.py is used instead. It exposes the same
+# functions as the DLL so the wrappers below do not care which one is loaded.
+# The engine is loaded on first use, not at import, so scripts that only use
+# PakFile or the conversion functions never touch the DLL.
 base_path = os.path.dirname(os.path.abspath(__file__))
 dll_path = os.path.join(base_path, "pak_lib.dll")
-if sys.platform == "win32":
-    os.add_dll_directory(os.path.dirname(dll_path))
-pak_lib = ctypes.CDLL(dll_path)
-
 
 # Explicitly declare parameter and return types of functions in DLL
-# ========================== File/Memory Handling ===========================
-# void closePakBinFile(int df);
-pak_lib.closePakBinFile.argtypes = [ctypes.c_int]
-pak_lib.closePakBinFile.restype = None
+def _declare_prototypes(lib):
+    # ========================== File/Memory Handling ===========================
+    # void closePakBinFile(int df);
+    lib.closePakBinFile.argtypes = [ctypes.c_int]
+    lib.closePakBinFile.restype = None
+
+    # void freeBinPakData(struct binPakData* pData);
+    lib.freeBinPakData.argtypes = [ctypes.POINTER(BinPakData)]
+    lib.freeBinPakData.restype = None
+
+    # int openPakBinFile(char *filename, short *nDataArrays, int oMode);
+    lib.openPakBinFile.argtypes = [ctypes.c_char_p, ctypes.POINTER(ctypes.c_short), ctypes.c_int]
+    lib.openPakBinFile.restype = ctypes.c_int
+
+    # ========================== Reads ===========================
+    # struct binPakData *readDataSetData(int df);
+    lib.readDataSetData.argtypes = [ctypes.c_int]
+    lib.readDataSetData.restype = ctypes.POINTER(BinPakData)
+
+    # int readDataSetHeader(int df, long *nDataSets);
+    lib.readDataSetHeader.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_long)]
+    lib.readDataSetHeader.restype = ctypes.c_int
+
+    # int readDataSetName(int df, char *dsName);
+    lib.readDataSetName.argtypes = [ctypes.c_int, ctypes.c_char_p]
+    lib.readDataSetName.restype = ctypes.c_int
+
+    # int readDataSetDataInfo(int df, int *cplx, long *nVal);
+    lib.readDataSetDataInfo.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_long)]
+    lib.readDataSetDataInfo.restype = ctypes.c_int
+
+    # double *readDataSetDataValues(int df, int cplx, long nVal);
+    lib.readDataSetDataValues.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_long]
+    lib.readDataSetDataValues.restype = ctypes.POINTER(ctypes.c_double)
+
+    # struct binPakData *readOneDataSet(int df);
+    lib.readOneDataSet.argtypes = [ctypes.c_int]
+    lib.readOneDataSet.restype = ctypes.POINTER(BinPakData)
+
+    # ========================== Writes ===========================
+    # int writeDataSetData(int df, struct binPakData *pData);
+    lib.writeDataSetData.argtypes = [ctypes.c_int, ctypes.POINTER(BinPakData)]
+    lib.writeDataSetData.restype = ctypes.c_int
+
+    # int writeDataSetHeader(int df, long nDataSets);
+    lib.writeDataSetHeader.argtypes = [ctypes.c_int, ctypes.c_long]
+    lib.writeDataSetHeader.restype = ctypes.c_int
+
+    # int writeDataSetName(int df, char *dsName);
+    lib.writeDataSetName.argtypes = [ctypes.c_int, ctypes.c_char_p]
+    lib.writeDataSetName.restype = ctypes.c_int
+
+    # int writeDataSetDataInfo(int df, int cplx, long nVal);
+    lib.writeDataSetDataInfo.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_long]
+    lib.writeDataSetDataInfo.restype = ctypes.c_int
+
+    # int writeDataSetDataValues(int df, int cplx, long nVal, double *data);
+    lib.writeDataSetDataValues.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_long, ctypes.POINTER(ctypes.c_double)]
+    lib.writeDataSetDataValues.restype = ctypes.c_int
+
+    # int writeOneDataSet(int df, struct binPakData *pData);
+    lib.writeOneDataSet.argtypes = [ctypes.c_int, ctypes.POINTER(BinPakData)]
+    lib.writeOneDataSet.restype = ctypes.c_int
+
+    # int writePakBinFileHeader(int df, short nDataArrays);
+    lib.writePakBinFileHeader.argtypes = [ctypes.c_int, ctypes.c_short]
+    lib.writePakBinFileHeader.restype = ctypes.c_int
 
-# void freeBinPakData(struct binPakData* pData);
-pak_lib.freeBinPakData.argtypes = [ctypes.POINTER(BinPakData)]
-pak_lib.freeBinPakData.restype = None
 
-# int openPakBinFile(char *filename, short *nDataArrays, int oMode);
-pak_lib.openPakBinFile.argtypes = [ctypes.c_char_p, ctypes.POINTER(ctypes.c_short), ctypes.c_int]
-pak_lib.openPakBinFile.restype = ctypes.c_int
+def _load_pak_lib():
+    if os.environ.get("PAK_ENGINE", "").lower() != "native":
+        try:
+            if sys.platform == "win32":
+                os.add_dll_directory(os.path.dirname(dll_path))
+            lib = ctypes.CDLL(dll_path)
+        except OSError:
+            pass
+        else:
+            _declare_prototypes(lib)
+            return lib, "dll"
+    return pak_native, "native"
 
-# ========================== Reads ===========================
-# struct binPakData *readDataSetData(int df);
-pak_lib.readDataSetData.argtypes = [ctypes.c_int]
-pak_lib.readDataSetData.restype = ctypes.POINTER(BinPakData)
+_engine_lock = threading.Lock()
+_engine = None
 
-# int readDataSetHeader(int df, long *nDataSets);
-pak_lib.readDataSetHeader.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_long)]
-pak_lib.readDataSetHeader.restype = ctypes.c_int
+# Name of the engine in use, "dll" or "native" (loads it if needed)
+def pak_engine():
+    return _bind_pak_lib()[1]
 
-# int readDataSetName(int df, char *dsName);
-pak_lib.readDataSetName.argtypes = [ctypes.c_int, ctypes.c_char_p]
-pak_lib.readDataSetName.restype = ctypes.c_int
+def _bind_pak_lib():
+    global pak_lib, _engine
+    with _engine_lock:
+        if _engine is None:
+            # Rebinding the global means later calls go straight to the engine
+            pak_lib, name = _load_pak_lib()
+            _engine = (pak_lib, name)
+    return _engine
 
-# int readDataSetDataInfo(int df, int *cplx, long *nVal);
-pak_lib.readDataSetDataInfo.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_long)]
-pak_lib.readDataSetDataInfo.restype = ctypes.c_int
+# Stands in for pak_lib until the first wrapper call loads the engine
+class _LazyPakLib:
+    def __getattr__(self, name):
+        return getattr(_bind_pak_lib()[0], name)
 
-# double *readDataSetDataValues(int df, int cplx, long nVal);
-pak_lib.readDataSetDataValues.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_long]
-pak_lib.readDataSetDataValues.restype = ctypes.POINTER(ctypes.c_double)
+pak_lib = _LazyPakLib()
 
-# struct binPakData *readOneDataSet(int df);
-pak_lib.readOneDataSet.argtypes = [ctypes.c_int]
-pak_lib.readOneDataSet.restype = ctypes.POINTER(BinPakData)
 
-# ========================== Writes ===========================
-# int writeDataSetData(int df, struct binPakData *pData);
-pak_lib.writeDataSetData.argtypes = [ctypes.c_int, ctypes.POINTER(BinPakData)]
-pak_lib.writeDataSetData.restype = ctypes.c_int
+# Sizes recorded by the instrumentation layer (pak_instrument.py)
+DOUBLE_SIZE = ctypes.sizeof(ctypes.c_double)
 
-# int writeDataSetHeader(int df, long nDataSets);
-pak_lib.writeDataSetHeader.argtypes = [ctypes.c_int, ctypes.c_long]
-pak_lib.writeDataSetHeader.restype = ctypes.c_int
+def _value(arg):
+    return getattr(arg, "value", arg)
 
-# int writeDataSetName(int df, char *dsName);
-pak_lib.writeDataSetName.argtypes = [ctypes.c_int, ctypes.c_char_p]
-pak_lib.writeDataSetName.restype = ctypes.c_int
+def _data_set_bytes(pdata):
+    data = pdata.contents if isinstance(pdata, ctypes._Pointer) else pdata
+    n_values = data.nx * data.xCplx + data.nz * data.zCplx + data.nz * data.nx * data.yCplx
+    return pak_native.NAME_SIZE + 3 * pak_native.DATA_INFO_SIZE + n_values * DOUBLE_SIZE
 
-# int writeDataSetDataInfo(int df, int cplx, long nVal);
-pak_lib.writeDataSetDataInfo.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_long]
-pak_lib.writeDataSetDataInfo.restype = ctypes.c_int
+def _open_bytes(result, filename, n_data_arrays, o_mode):
+    return pak_native.FILE_HEADER_SIZE if o_mode == pak_native.READ else 0
 
-# int writeDataSetDataValues(int df, int cplx, long nVal, double *data);
-pak_lib.writeDataSetDataValues.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_long, ctypes.POINTER(ctypes.c_double)]
-pak_lib.writeDataSetDataValues.restype = ctypes.c_int
+def _fixed_bytes(size):
+    return lambda result, *args: size
 
-# int writeOneDataSet(int df, struct binPakData *pData);
-pak_lib.writeOneDataSet.argtypes = [ctypes.c_int, ctypes.POINTER(BinPakData)]
-pak_lib.writeOneDataSet.restype = ctypes.c_int
+def _values_bytes(result, df, cplx, n_val, *data):
+    return _value(cplx) * _value(n_val) * DOUBLE_SIZE
+
+def _array_samples(result, *args):
+    return result.size if isinstance(result, np.ndarray) else len(result)
+
+def _input_samples(result, data, *arrays):
+    return sum(np.size(arr) for arr in arrays)
 
-# int writePakBinFileHeader(int df, short nDataArrays);
-pak_lib.writePakBinFileHeader.argtypes = [ctypes.c_int, ctypes.c_short]
-pak_lib.writePakBinFileHeader.restype = ctypes.c_int
 
 # Python wrappers that call DLL functions
 # ============= File/Memory handling ===============
+@instrumented(_open_bytes)
 def py_open_pak_bin_file(filename, n_data_arrays, o_mode):
     if isinstance(filename, str):
         filename = filename.encode('utf-8')
@@ -118,147 +178,505 @@ def py_open_pak_bin_file(filename, n_data_arrays, o_mode):
         raise FileNotFoundError(f"Failed to open input file: {filename}")
     return df
     
+@instrumented()
 def py_close_pak_bin_file(df):
     return pak_lib.closePakBinFile(df)
 
+@instrumented()
 def py_free_bin_pak_data(pdata):
-    return pak_lib.freeBinPakData(pdata)
+    # stacklevel 4 skips the instrumentation wrapper around this function
+    return _free_bin_pak_data(pdata, pak_lib.freeBinPakData, stacklevel=4)
+
+def _free_bin_pak_data(pdata, free_function, stacklevel=3):
+    # NumPy views from *data_as_np_array point straight into the buffers freed
+    # here, so if any are still alive the free is deferred until they are gone
+    live = [buf for buf in (ref() for ref in _live_views.pop(_data_address(pdata), [])) if buf is not None]
+    if live:
+        warnings.warn(f"BinPakData freed while {len(live)} NumPy view(s) of it are still in use, "
+                      "the free is deferred until they are released", ResourceWarning, stacklevel=stacklevel)
+        remaining = [len(live)]
+        def release():
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                free_function(pdata)
+        for buf in live:
+            weakref.finalize(buf, release)
+        return None
+    return free_function(pdata)
 
 # ==================== READS ====================
+@instrumented(lambda result, df: _data_set_bytes(result) - pak_native.NAME_SIZE if result else 0)
 def py_read_data_set_data(df):
     return pak_lib.readDataSetData(df) 
 
+@instrumented(_fixed_bytes(pak_native.DATA_SET_HEADER_SIZE))
 def py_read_data_set_header(df, n_data_sets):
     ret = pak_lib.readDataSetHeader(df, n_data_sets)
     if ret < 0:
         raise RuntimeError("Failed to read data set header")
     return ret
 
+@instrumented(_fixed_bytes(pak_native.NAME_SIZE))
 def py_read_data_set_name(df, ds_name):
     return pak_lib.readDataSetName(df, ds_name)
 
+@instrumented(_fixed_bytes(pak_native.DATA_INFO_SIZE))
 def py_read_data_set_data_info(df, cplx, n_val):
     return pak_lib.readDataSetDataInfo(df, cplx, n_val)
 
+@instrumented(_values_bytes)
 def py_read_data_set_data_values(df, cplx, n_val):
     return pak_lib.readDataSetDataValues(df, cplx, n_val)
 
 # be sure to free memory after using the function below: py_read_one_data_set
+@instrumented(lambda result, df: _data_set_bytes(result))
 def py_read_one_data_set(df):
     p_data = pak_lib.readOneDataSet(df)
     if not p_data:
         raise RuntimeError("Failed to read one data set")
-    if p_data.contents.nz != 1:
-        raise ValueError("This program only works with nz = 1, got nz = {}".format(p_data.contents.nz)) 
-
     return p_data
 
 # ==================== WRITES ====================
+@instrumented(lambda result, df, pdata: _data_set_bytes(pdata) - pak_native.NAME_SIZE)
 def py_write_data_set_data(df, pdata):
     return pak_lib.writeDataSetData(df, pdata)
 
+@instrumented(_fixed_bytes(pak_native.DATA_SET_HEADER_SIZE))
 def py_write_data_set_header(df, n_data_sets):
     ret = pak_lib.writeDataSetHeader(df, n_data_sets)
     if ret < 0:
         raise RuntimeError("Failed to write data set header")
     return ret
 
+@instrumented(_fixed_bytes(pak_native.NAME_SIZE))
 def py_write_data_set_name(df, ds_name):
     if isinstance(ds_name, str):
         ds_name = ds_name.encode('utf-8')
     return pak_lib.writeDataSetName(df, ds_name)
 
+@instrumented(_fixed_bytes(pak_native.DATA_INFO_SIZE))
 def py_write_data_set_data_info(df, cplx, n_val):
     return pak_lib.writeDataSetDataInfo(df, cplx, n_val)
 
+@instrumented(_values_bytes)
 def py_write_data_set_data_values(df, cplx, n_val, data):
     return pak_lib.writeDataSetDataValues(df, cplx, n_val, data)
 
+@instrumented(lambda result, df, pdata: _data_set_bytes(pdata))
 def py_write_one_data_set(df, pdata):
     ret = pak_lib.writeOneDataSet(df, pdata)
     if ret < 0:
         raise RuntimeError("Failed to write one data set")
     return ret
 
+@instrumented(_fixed_bytes(pak_native.FILE_HEADER_SIZE))
 def py_write_pak_bin_file_header(df, n_data_arrays):
     ret = pak_lib.writePakBinFileHeader(df, n_data_arrays)
     if ret < 0:
         raise RuntimeError("Failed to write PAK bin file header")
     return ret
 
+# ==================== PER-HANDLE FILES ====================
+# One open PAK file. The DLL keeps the byte order and version of the last opened
+# file in process-wide static variables, so the py_* wrappers cannot safely mix
+# LSB and MSB files or be used from several threads. A PakFile always uses the
+# native engine and keeps its own descriptor, byte order and version, so any
+# number of them can be used concurrently (one per thread, or shared: calls on
+# one PakFile are serialized with a lock). byte_order ("<" or ">") selects the
+# byte order of files opened for writing, the default is the machine order.
+class PakFile:
+    def __init__(self, filename, o_mode=pak_native.READ, byte_order=None):
+        df, n_data_arrays = pak_native.open_file(filename, o_mode, byte_order or pak_native.NATIVE_ORDER)
+        if df < 0:
+            raise FileNotFoundError(f"Failed to open PAK file: {filename}")
+        self.filename = filename
+        self.df = df
+        self.o_mode = o_mode
+        self.n_data_arrays = n_data_arrays
+        self.byte_order = pak_native.byte_order(df)
+        self.version = pak_native.file_version(df)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self.df is not None:
+                pak_native.closePakBinFile(self.df)
+                self.df = None
+
+    # READS
+    def read_data_set_header(self):
+        n_data_sets = ctypes.c_long()
+        with self._lock:
+            if pak_native.readDataSetHeader(self.df, ctypes.byref(n_data_sets)) < 0:
+                raise RuntimeError("Failed to read data set header")
+        return n_data_sets.value
+
+    # Free the result with free_data_set (not py_free_bin_pak_data, which may be the DLL's)
+    def read_one_data_set(self):
+        with self._lock:
+            p_data = pak_native.readOneDataSet(self.df)
+        if not p_data:
+            raise RuntimeError("Failed to read one data set")
+        return p_data
+
+    def free_data_set(self, p_data):
+        return _free_bin_pak_data(p_data, pak_native.freeBinPakData)
+
+    def iter_data_sets(self, free=True):
+        return _iter_data_sets(self.read_data_set_header, self.read_one_data_set,
+                               self.free_data_set if free else None, self.n_data_arrays)
+
+    # WRITES
+    def write_pak_bin_file_header(self, n_data_arrays):
+        with self._lock:
+            if pak_native.writePakBinFileHeader(self.df, n_data_arrays) < 0:
+                raise RuntimeError("Failed to write PAK bin file header")
+        self.n_data_arrays = getattr(n_data_arrays, "value", n_data_arrays)
+
+    def write_data_set_header(self, n_data_sets):
+        with self._lock:
+            if pak_native.writeDataSetHeader(self.df, n_data_sets) < 0:
+                raise RuntimeError("Failed to write data set header")
+
+    def write_one_data_set(self, p_data):
+        with self._lock:
+            if pak_native.writeOneDataSet(self.df, p_data) < 0:
+                raise RuntimeError("Failed to write one data set")
+
+    def write_data_sets(self, n_data_arrays, data_sets):
+        _write_data_sets(self.write_pak_bin_file_header, self.write_data_set_header,
+                         self.write_one_data_set, n_data_arrays, data_sets)
+
+
+# ==================== STREAMING ====================
+# Yields (array_index, n_data_sets, p_data) for every data set of every data set
+# array in an open file, one at a time. Each data set is freed as soon as the
+# caller asks for the next one, so a whole file is handled in constant memory.
+# With free = False the caller owns the data sets and frees them itself (with
+# py_free_bin_pak_data, or PakFile.free_data_set), e.g. to keep several in flight.
+# df is a descriptor from py_open_pak_bin_file or a PakFile.
+def iter_data_sets(df, n_data_arrays=None, free=True):
+    if isinstance(df, PakFile):
+        return df.iter_data_sets(free)
+    def read_header():
+        n_data_sets = ctypes.c_long()
+        py_read_data_set_header(df, ctypes.byref(n_data_sets))
+        return n_data_sets.value
+    return _iter_data_sets(read_header, lambda: py_read_one_data_set(df),
+                           py_free_bin_pak_data if free else None, n_data_arrays)
+
+def _iter_data_sets(read_header, read_one, free, n_data_arrays):
+    for i_array in range(getattr(n_data_arrays, "value", n_data_arrays)):
+        n_data_sets = read_header()
+        for _ in range(n_data_sets):
+            p_data = read_one()
+            if free is None:
+                yield i_array, n_data_sets, p_data
+                continue
+            try:
+                yield i_array, n_data_sets, p_data
+            finally:
+                free(p_data)
+
+# Consumes (array_index, n_data_sets, p_data) items as produced by iter_data_sets
+# and writes the file header, one data set header per array and the data sets.
+# Arrays that do not appear in the stream are written as empty arrays. Raises if
+# an array receives a different number of data sets than its header announced.
+# df is a descriptor from py_open_pak_bin_file or a PakFile.
+def write_data_sets(df, n_data_arrays, data_sets):
+    if isinstance(df, PakFile):
+        return df.write_data_sets(n_data_arrays, data_sets)
+    _write_data_sets(lambda n: py_write_pak_bin_file_header(df, n), lambda n: py_write_data_set_header(df, n),
+                     lambda p_data: py_write_one_data_set(df, p_data), n_data_arrays, data_sets)
+
+def _write_data_sets(write_file_header, write_header, write_one, n_data_arrays, data_sets):
+    n_data_arrays = getattr(n_data_arrays, "value", n_data_arrays)
+    write_file_header(n_data_arrays)
+
+    current_array, expected, written = -1, 0, 0
+    def finish_array():
+        if written != expected:
+            raise RuntimeError(f"Data set array {current_array} announced {expected} data sets, got {written}")
+
+    for i_array, n_data_sets, p_data in data_sets:
+        if i_array != current_array:
+            if i_array < current_array or i_array >= n_data_arrays:
+                raise ValueError(f"Data set array index {i_array} out of order or out of range")
+            finish_array()
+            for _ in range(current_array + 1, i_array):
+                write_header(0)
+            write_header(n_data_sets)
+            current_array, expected, written = i_array, n_data_sets, 0
+        write_one(p_data)
+        # The filtered data set may still point into the input buffers, which
+        # are freed when the next data set is asked for
+        del p_data
+        written += 1
+    finish_array()
+    for _ in range(current_array + 1, n_data_arrays):
+        write_header(0)
+
 # Functions to convert binPakData to numpy arrays and vice versa
 # Y DATA
+# Complex data (yCplx = 2) is returned as nx complex128 values
+@instrumented(measure_samples=_array_samples)
 def ydata_to_np_array(data):
-    nx = data.nx
-    ydata = data.ydata.contents
-    y_array1 = np.zeros(nx, dtype = np.float64)
-    for i in range(nx):
-        y_array1[i] = ydata[i]
-    return y_array1
+    if data.nz == 0 or not data.ydata:
+        return np.zeros(data.nx, dtype=np.complex128 if data.yCplx == 2 else np.float64)
+    y_array = _double_copy(_pointer_address(data.ydata[0]), data.nx * data.yCplx)
+    return y_array.view(np.complex128) if data.yCplx == 2 else y_array
 
+@instrumented(measure_samples=_array_samples)
 def np_array_to_ydata(filtered_data):
-    filt_ydata_array = (ctypes.c_double * filtered_data.size)()
-    for i in range(filtered_data.size):
-        filt_ydata_array[i] = filtered_data[i]
-    return filt_ydata_array
+    return _as_c_double_array(filtered_data)
 
 # X DATA
+@instrumented(measure_samples=_array_samples)
 def xdata_to_np_array(data):
-    nx = data.nx
-    xdata = data.xdata
-    x_array1 = np.zeros(nx, dtype = np.float64)
-    for i in range(nx):
-        x_array1[i] = xdata[i]
-    return x_array1
+    return _double_block(data, data.xdata, data.nx, copy=True)
 
+@instrumented(measure_samples=_array_samples)
 def np_array_to_xdata(filtered_data):
-    filt_xdata_array = (ctypes.c_double * filtered_data.size)()
-    for i in range(filtered_data.size):
-        filt_xdata_array[i] = filtered_data[i]
-    return filt_xdata_array
+    return _as_c_double_array(filtered_data)
 
 # Z DATA
+@instrumented(measure_samples=_array_samples)
 def zdata_to_np_array(data):
-    nz = data.nz
-    zdata = data.zdata
-    z_array1 = np.zeros(nz, dtype = np.float64)
-    for i in range(nz):
-        z_array1[i] = zdata[i]
-    return z_array1
+    return _double_block(data, data.zdata, data.nz, copy=True)
 
+@instrumented(measure_samples=_array_samples)
 def np_array_to_zdata(filtered_data):
-    filt_zdata_array = (ctypes.c_double * filtered_data.size)()
-    for i in range(filtered_data.size):
-        filt_zdata_array[i] = filtered_data[i]
-    return filt_zdata_array
+    return _as_c_double_array(filtered_data)
+
+
+# Zero-copy conversions
+# The *_as_np_array functions return (nz, nx * yCplx) / (nx * xCplx,) / (nz * zCplx,)
+# arrays. With copy = False they are views straight into the BinPakData buffers,
+# which stay valid until py_free_bin_pak_data is called. With copy = True they
+# are owned arrays filled with a single memcpy.
+
+# ctypes buffers behind the views handed out, keyed by address of the BinPakData
+_live_views = {}
+
+def _data_address(data):
+    if isinstance(data, BinPakData):
+        return ctypes.addressof(data)
+    if isinstance(data, ctypes._Pointer):
+        return ctypes.addressof(data.contents)
+    return ctypes.addressof(data._obj)  # byref(BinPakData)
+
+# Address a ctypes pointer holds. ctypes.cast(ptr, c_void_p) would put ptr in a
+# reference cycle that keeps the struct it was read from alive until the garbage
+# collector runs.
+def _pointer_address(ptr):
+    return ctypes.addressof(ptr.contents) if ptr else None
+
+def _double_view(data, address, count):
+    # View count doubles starting at address, remembered for py_free_bin_pak_data
+    buf = (ctypes.c_double * count).from_address(address)
+    buf._pak_owner = data  # the struct must outlive the view even if the caller drops it
+    _live_views.setdefault(_data_address(data), []).append(weakref.ref(buf))
+    return np.ctypeslib.as_array(buf)
+
+def _double_copy(address, count):
+    arr = np.empty(count, dtype=np.float64)
+    if count:
+        ctypes.memmove(arr.ctypes.data, address, count * arr.itemsize)
+    return arr
+
+def _double_block(data, ptr, count, copy):
+    address = _pointer_address(ptr)
+    if count == 0 or not address:
+        return np.zeros(0, dtype=np.float64)
+    if copy:
+        return _double_copy(address, count)
+    return _double_view(data, address, count)
+
+def _ydata_row_addresses(data):
+    row_ptrs = (ctypes.c_size_t * data.nz).from_address(_pointer_address(data.ydata))
+    return np.ctypeslib.as_array(row_ptrs).copy()
+
+# X DATA
+@instrumented(measure_samples=_array_samples)
+def xdata_as_np_array(data, copy=False):
+    return _double_block(data, data.xdata, data.nx * data.xCplx, copy)
 
+# Z DATA
+@instrumented(measure_samples=_array_samples)
+def zdata_as_np_array(data, copy=False):
+    return _double_block(data, data.zdata, data.nz * data.zCplx, copy)
 
+# Y DATA
+# One view is only possible when the rows are laid out back to back in memory,
+# which is always the case for the native engine. Rows malloc'd separately (the
+# DLL does this) are gathered into one owned block with one memcpy per row.
+@instrumented(measure_samples=_array_samples)
+def ydata_as_np_array(data, copy=False):
+    row_len = data.nx * data.yCplx
+    if data.nz == 0 or row_len == 0 or not data.ydata:
+        return np.zeros((data.nz, row_len), dtype=np.float64)
+    rows = _ydata_row_addresses(data)
+    row_bytes = row_len * ctypes.sizeof(ctypes.c_double)
+    contiguous = bool(np.all(np.diff(rows) == row_bytes))
+    if contiguous:
+        return _double_block(data, data.ydata[0], data.nz * row_len, copy).reshape(data.nz, row_len)
+    y_array = np.empty((data.nz, row_len), dtype=np.float64)
+    for i, address in enumerate(rows):
+        ctypes.memmove(y_array[i].ctypes.data, int(address), row_bytes)
+    return y_array
+
+
+# Complex Y DATA (yCplx = 2) as (nz, nx) complex128, a view over the interleaved
+# (re, im) doubles unless copy = True
+@instrumented(measure_samples=_array_samples)
+def ydata_as_complex_array(data, copy=False):
+    if data.yCplx != 2:
+        raise ValueError(f"ydata is not complex (yCplx = {data.yCplx})")
+    return ydata_as_np_array(data, copy).view(np.complex128)
+
+# Single precision Y DATA for the float32 working mode (see pak_float32.py) as
+# (nz, nx) float32, or complex64 when yCplx = 2. The doubles are converted once,
+# straight from the BinPakData buffers. copy_bin_data widens the result back to
+# float64, so files are still written in double precision.
+@instrumented(measure_samples=_array_samples)
+def ydata_as_float32_array(data):
+    y_array = ydata_as_np_array(data).astype(np.float32)
+    return y_array.view(np.complex64) if data.yCplx == 2 else y_array
+
+# Implicit x axis
+# Evenly sampled channels (time axes) have x = x0 + dx * i. A UniformAxis keeps
+# just (x0, dx, n) and behaves like a read-only 1-D float64 array: len, shape,
+# indexing and np.asarray work, and the n values are only allocated when they
+# are asked for. copy_bin_data expands it, so the file still gets the full block.
+class UniformAxis:
+    ndim = 1
+    dtype = np.dtype(np.float64)
+
+    def __init__(self, x0, dx, n):
+        self.x0 = float(x0)
+        self.dx = float(dx)
+        self.n = int(n)
+
+    @property
+    def shape(self):
+        return (self.n,)
+
+    @property
+    def size(self):
+        return self.n
+
+    def __len__(self):
+        return self.n
+
+    def __repr__(self):
+        return f"UniformAxis(x0={self.x0!r}, dx={self.dx!r}, n={self.n})"
+
+    def expand(self):
+        return self.x0 + self.dx * np.arange(self.n, dtype=np.float64)
+
+    def __array__(self, dtype=None, copy=None):
+        arr = self.expand()
+        return arr if dtype is None else arr.astype(dtype, copy=False)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            i = int(key) + self.n if key < 0 else int(key)
+            if not 0 <= i < self.n:
+                raise IndexError(f"index {key} is out of bounds for axis with size {self.n}")
+            return self.x0 + self.dx * float(i)
+        return self.expand()[key]
+
+# UniformAxis for x if expanding it gives exactly the values in x, else None.
+# The only candidate step is (x[-1] - x[0]) / (n - 1). x is compared block by
+# block against the same x0 + dx * i the axis expands to, so the full expansion
+# is never built and an uneven axis stops at its first mismatching block.
+AXIS_CHECK_BLOCK = 1 << 16
+
+def uniform_axis(x):
+    x = np.asarray(x)
+    if x.ndim != 1 or x.size == 0 or x.dtype != np.float64:
+        return None
+    n = x.size
+    axis = UniformAxis(x[0], 0.0 if n == 1 else (x[-1] - x[0]) / (n - 1), n)
+    if not (axis[n - 1] == x[-1] and axis[n // 2] == x[n // 2]):
+        return None
+    block = min(n, AXIS_CHECK_BLOCK)
+    index = np.arange(block, dtype=np.float64)
+    expected = np.empty(block)
+    for start in range(0, n, block):
+        count = min(block, n - start)
+        values = expected[:count]
+        np.add(index[:count], start, out=values)
+        np.multiply(values, axis.dx, out=values)
+        np.add(values, axis.x0, out=values)
+        if not np.array_equal(values, x[start:start + count]):
+            return None
+    return axis
+
+# X DATA as a UniformAxis when it is evenly spaced (nothing is copied), otherwise
+# as an owned array like xdata_to_np_array
+@instrumented(measure_samples=_array_samples)
+def xdata_as_axis(data):
+    if data.xCplx == 1:
+        axis = uniform_axis(xdata_as_np_array(data))
+        if axis is not None:
+            return axis
+    return xdata_to_np_array(data)
+
+# Share the memory of a numpy array with a ctypes double array. The input is
+# only converted (one copy) if it is not C-contiguous float64 or is read-only.
+# Complex arrays are shared as interleaved (re, im) doubles, the layout PAK uses
+# for yCplx = 2. The ctypes array keeps the numpy buffer alive.
+def _as_c_double_array(arr):
+    return np.ctypeslib.as_ctypes(_as_double_buffer(arr).reshape(-1))
+
+def _as_double_buffer(arr):
+    if np.iscomplexobj(arr):
+        arr = np.ascontiguousarray(arr, dtype=np.complex128)
+    else:
+        arr = np.ascontiguousarray(arr, dtype=np.float64)
+    if not arr.flags.writeable:
+        arr = arr.copy()
+    return arr.view(np.float64)
+
+@instrumented(measure_samples=_input_samples)
 def copy_bin_data(data, filtered_x_data, filtered_y_data, filtered_z_data):
-    # Create object in Python so do not have to free it 
+    # Create object in Python so do not have to free it. The x, y and z pointers
+    # point straight into the numpy buffers, which stay alive with the struct
     new_data_ptr = ctypes.pointer(BinPakData())
     new_data = new_data_ptr.contents
+    if isinstance(filtered_x_data, UniformAxis):
+        filtered_x_data = filtered_x_data.expand()
 
     new_data.name = data.name
     new_data.nz = filtered_z_data.size
     new_data.nx = filtered_x_data.size
     new_data.xCplx = data.xCplx
     new_data.zCplx = data.zCplx
-    new_data.yCplx = data.yCplx
-
     # X DATA
-    x_ptr = np_array_to_xdata(filtered_x_data)
-    new_data.xdata = ((ctypes.c_double) * 1)()
-    new_data.xdata = x_ptr 
-
-    # Y DATA
-    y_ptr_0 = np_array_to_ydata(filtered_y_data)
-    new_data.ydata = (ctypes.POINTER(ctypes.c_double) * 1)()
-    new_data.ydata[0] = y_ptr_0 
+    new_data.xdata = np_array_to_xdata(filtered_x_data)
+
+    # Y DATA (one row per z value, a 1-D array is a single row). Complex ydata
+    # is written as interleaved doubles with yCplx = 2, real ydata with yCplx = 1
+    new_data.yCplx = 2 if np.iscomplexobj(filtered_y_data) else 1
+    y_rows = _as_double_buffer(np.atleast_2d(filtered_y_data))
+    if y_rows.shape[0] != new_data.nz:
+        raise ValueError(f"ydata has {y_rows.shape[0]} rows but zdata has {new_data.nz} values")
+    # Short rows would be read past their end when written, longer rows are cut
+    # to nx values as before
+    if y_rows.shape[1] < new_data.nx * new_data.yCplx:
+        raise ValueError(f"ydata rows have {y_rows.shape[1]} values but xdata has {new_data.nx} values "
+                         f"(yCplx = {new_data.yCplx})")
+    new_data.ydata = row_pointers(y_rows)
 
     # Z DATA
-    z_ptr = np_array_to_zdata(filtered_z_data)
-    new_data.zdata = ((ctypes.c_double) * 1)()
-    new_data.zdata = z_ptr
+    new_data.zdata = np_array_to_zdata(filtered_z_data)
 
     return new_data_ptr
 
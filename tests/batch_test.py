@@ -0,0 +1,92 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests batch.py. Two copies of the sample file and one missing file   #
+# are processed in a process pool; the good files must match a main.py run and   #
+# the missing one must be reported without stopping the batch. A worker that     #
+# dies must be reported as an error and the summary still printed.               #
+##################################################################################
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import filecmp
+from unittest import mock
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from main import process_file
+from batch import collect_jobs, run_batch, process_one
+import batch
+
+
+# Define file names as strings here
+ifile = "supporting_files/sin_wave.pak52"
+
+# Worker that dies without returning on inputs named crash*, like a crash in the DLL
+def crashing_process_one(ifile, ofile, *args):
+    if os.path.basename(ifile).startswith("crash"):
+        os._exit(1)
+    return process_one(ifile, ofile, *args)
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.in_dir = os.path.join(self.tmp_dir, "in")
+        self.out_dir = os.path.join(self.tmp_dir, "out")
+        os.makedirs(self.in_dir)
+        os.makedirs(self.out_dir)
+        for name in ("a.pak52", "b.pak52"):
+            shutil.copy(ifile, os.path.join(self.in_dir, name))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_batch_matches_main(self):
+        manifest = os.path.join(self.tmp_dir, "manifest.txt")
+        with open(manifest, "w") as f:
+            f.write("# missing input is reported, not fatal\n")
+            f.write(os.path.join(self.in_dir, "missing.pak52") + "\n")
+
+        jobs = collect_jobs([os.path.join(self.in_dir, "*.pak52")], manifest, self.out_dir)
+        lines = []
+        results = run_batch(jobs, workers=2, report=lines.append)
+
+        self.assertEqual([os.path.basename(r[0]) for r in results], ["a.pak52", "b.pak52", "missing.pak52"])
+        self.assertEqual([r[2] is None for r in results], [True, True, False])
+        self.assertEqual(lines[-1], "2 of 3 files processed, 1 failed")
+
+        expected = os.path.join(self.tmp_dir, "expected.bin")
+        process_file(ifile, expected)
+        for name in ("a.pak52", "b.pak52"):
+            self.assertTrue(filecmp.cmp(expected, os.path.join(self.out_dir, name), shallow=False))
+
+    def test_refuses_to_overwrite_input(self):
+        with self.assertRaises(ValueError):
+            collect_jobs([os.path.join(self.in_dir, "a.pak52")], output_dir=self.in_dir)
+
+    def test_refuses_duplicate_outputs(self):
+        for sub_dir in ("x", "y"):
+            os.makedirs(os.path.join(self.in_dir, sub_dir))
+            shutil.copy(ifile, os.path.join(self.in_dir, sub_dir, "run.pak52"))
+        with self.assertRaises(ValueError):
+            collect_jobs([os.path.join(self.in_dir, "*", "run.pak52")], output_dir=self.out_dir)
+
+    def test_worker_crash_is_reported(self):
+        jobs = [(os.path.join(self.in_dir, name), os.path.join(self.out_dir, name))
+                for name in ("a.pak52", "crash.pak52", "b.pak52")]
+        lines = []
+        with mock.patch.object(batch, "process_one", crashing_process_one):
+            results = run_batch(jobs, workers=1, report=lines.append)
+
+        self.assertEqual([r[0] for r in results], [job[0] for job in jobs])
+        self.assertIn("BrokenProcessPool", results[1][2])
+        n_failed = sum(1 for r in results if r[2] is not None)
+        self.assertGreaterEqual(n_failed, 2)  # b can no longer run after the crash
+        self.assertEqual(lines[-1], f"{3 - n_failed} of 3 files processed, {n_failed} failed")
+        self.assertEqual(len(lines), 4)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file runs the smallest benchmarks/bench_pak.py case once to make sure the #
+# suite still works and the JSON output has every stage for every case.          #
+##################################################################################
+
+import unittest
+import sys
+import os
+import json
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+from bench_pak import run_benchmarks, STAGES
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_smallest_cases(self):
+        results = run_benchmarks(samples=[1e3], nz_values=[1, 10], cplx_values=[1, 2], repeat=1, report=lambda line: None)
+        results = json.loads(json.dumps(results))
+        self.assertEqual(len(results["results"]), 4)
+        for case in results["results"]:
+            self.assertEqual(case["nx"] * case["nz"], 1000)
+            self.assertEqual(set(case["stages"]), set(STAGES))
+            for stage in STAGES:
+                self.assertGreaterEqual(case["stages"][stage]["min"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
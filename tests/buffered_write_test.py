@@ -0,0 +1,100 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests the buffered writer in pak_native.py. Data sets written in one #
+# write call must be byte for byte the same as the unbuffered rw_data.c layout,  #
+# for LSB and MSB files, complex ydata and ydata rows scattered in memory.       #
+##################################################################################
+
+import unittest
+import sys
+import os
+import tempfile
+import numpy as np
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from read_write import PakFile, copy_bin_data
+from pak_struct import BinPakData, row_pointers
+import pak_native
+
+
+def make_data_sets():
+    template = BinPakData()
+    template.xCplx = template.zCplx = template.yCplx = 1
+    x = np.linspace(0.0, 1.0, 50)
+    z = np.arange(4, dtype=np.float64)
+    y = np.sin(np.outer(z + 1, x))
+    template.name = b"real"
+    real = copy_bin_data(template, x, y, z)
+    template.name = b"complex"
+    cplx = copy_bin_data(template, x, y + 1j * y, z)
+
+    # ydata rows scattered in memory (padded and in reverse order), like the DLL's
+    template.name = b"scattered"
+    scattered = copy_bin_data(template, x, y, z)
+    padded = np.zeros((4, 60))
+    padded[::-1, :50] = y
+    scattered.contents.ydata = row_pointers(padded[::-1, :50])
+    return [real, cplx, scattered]
+
+# Returns the number of writes issued, counted at the two functions that write
+# to the file (_write_bytes for records, write_values for blocks of doubles)
+def write_file(filename, byte_order, data_sets):
+    writes = [0]
+    def counting(function):
+        def wrapper(*args):
+            writes[0] += 1
+            return function(*args)
+        return wrapper
+    write_bytes, write_values = pak_native._write_bytes, pak_native.write_values
+    pak_native._write_bytes, pak_native.write_values = counting(write_bytes), counting(write_values)
+    try:
+        with PakFile(filename, pak_native.WRITE, byte_order) as pak:
+            pak.write_data_sets(1, ((0, len(data_sets), p_data) for p_data in data_sets))
+    finally:
+        pak_native._write_bytes, pak_native.write_values = write_bytes, write_values
+    return writes[0]
+
+
+class TestBufferedWrite(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.limit = pak_native.WRITE_BUFFER_LIMIT
+
+    def tearDown(self):
+        pak_native.WRITE_BUFFER_LIMIT = self.limit
+        self.tmp_dir.cleanup()
+
+    def test_matches_unbuffered(self):
+        data_sets = make_data_sets()
+        for byte_order in "<>":
+            buffered = os.path.join(self.tmp_dir.name, "buffered.pak52")
+            unbuffered = os.path.join(self.tmp_dir.name, "unbuffered.pak52")
+
+            writes = write_file(buffered, byte_order, data_sets)
+            # File header, data set header, then one write per data set
+            self.assertEqual(writes, 2 + len(data_sets))
+
+            pak_native.WRITE_BUFFER_LIMIT = 0
+            writes = write_file(unbuffered, byte_order, data_sets)
+            pak_native.WRITE_BUFFER_LIMIT = self.limit
+            self.assertGreater(writes, 2 + len(data_sets))
+
+            with open(buffered, "rb") as f_buffered, open(unbuffered, "rb") as f_unbuffered:
+                self.assertEqual(f_buffered.read(), f_unbuffered.read())
+            os.remove(buffered)
+            os.remove(unbuffered)
+
+    def test_name_too_long(self):
+        data_set = make_data_sets()[0]
+        data_set.contents.name = b"n" * 256  # no room for the terminating zero
+        with PakFile(os.path.join(self.tmp_dir.name, "long.pak52"), pak_native.WRITE) as pak:
+            pak.write_pak_bin_file_header(1)
+            pak.write_data_set_header(1)
+            with self.assertRaises(RuntimeError):
+                pak.write_one_data_set(data_set)
+
+
+if __name__ == "__main__":
+    unittest.main()
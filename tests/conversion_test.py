@@ -0,0 +1,173 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests the conversions between BinPakData and numpy arrays. The views #
+# returned by the *_as_np_array functions must match the element-wise copies and #
+# must keep the data alive until py_free_bin_pak_data is called.                 #
+##################################################################################
+
+import unittest
+import sys
+import os
+import ctypes
+import warnings
+import numpy as np
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from read_write import *
+from my_function import *
+
+READ_MODE = 1
+WRITE_MODE = 2
+
+
+# Define file names as strings here
+ifile = "supporting_files/sin_wave.pak52"
+ofile = "test_waterfall.bin"
+
+def read_first_data_set(ifile):
+    n_data_arrays = ctypes.c_short()
+    n_data_sets = ctypes.c_long()
+    df = py_open_pak_bin_file(ifile, ctypes.byref(n_data_arrays), READ_MODE)
+    py_read_data_set_header(df, ctypes.byref(n_data_sets))
+    p_data = py_read_one_data_set(df)
+    py_close_pak_bin_file(df)
+    return p_data
+
+class TestConversions(unittest.TestCase):
+    def test_views_match_copies(self):
+        p_data = read_first_data_set(ifile)
+        data = p_data.contents
+
+        x_view = xdata_as_np_array(data)
+        y_view = ydata_as_np_array(data)
+        z_view = zdata_as_np_array(data)
+        self.assertEqual(y_view.shape, (data.nz, data.nx * data.yCplx))
+        np.testing.assert_array_equal(x_view, [data.xdata[i] for i in range(data.nx)])
+        np.testing.assert_array_equal(y_view[0], [data.ydata[0][i] for i in range(data.nx)])
+        np.testing.assert_array_equal(z_view, [data.zdata[i] for i in range(data.nz)])
+        np.testing.assert_array_equal(x_view, xdata_to_np_array(data))
+        np.testing.assert_array_equal(y_view[0], ydata_to_np_array(data))
+        np.testing.assert_array_equal(z_view, zdata_to_np_array(data))
+
+        # Views alias the buffers, copies do not
+        y_copy = ydata_as_np_array(data, copy=True)
+        y_view[0, 0] = 42.0
+        self.assertEqual(data.ydata[0][0], 42.0)
+        self.assertNotEqual(y_copy[0, 0], 42.0)
+
+        del x_view, y_view, z_view
+        py_free_bin_pak_data(p_data)
+
+    def test_free_with_live_view_is_deferred(self):
+        p_data = read_first_data_set(ifile)
+        x_view = xdata_as_np_array(p_data.contents)
+        expected = x_view.copy()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            py_free_bin_pak_data(p_data)
+        self.assertTrue(any(issubclass(w.category, ResourceWarning) for w in caught))
+        np.testing.assert_array_equal(x_view, expected)
+        del x_view
+
+    def test_copy_bin_data_shares_buffers(self):
+        p_data = read_first_data_set(ifile)
+        data = p_data.contents
+        x_array = xdata_to_np_array(data)
+        y_array = ydata_to_np_array(data)
+        z_array = zdata_to_np_array(data)
+
+        new_data_ptr = copy_bin_data(data, x_array, y_array, z_array)
+        new_data = new_data_ptr.contents
+        self.assertEqual(ctypes.cast(new_data.xdata, ctypes.c_void_p).value, x_array.ctypes.data)
+        self.assertEqual(ctypes.cast(new_data.ydata[0], ctypes.c_void_p).value, y_array.ctypes.data)
+        py_free_bin_pak_data(p_data)
+
+        # Non-contiguous / non-float64 input is converted and kept alive by the struct
+        y_strided = np.repeat(y_array, 2)[::2]
+        new_data_ptr = copy_bin_data(new_data, x_array.astype(np.float32), y_strided, z_array)
+        del y_strided
+        np.testing.assert_array_equal(ydata_as_np_array(new_data_ptr.contents, copy=True)[0], y_array)
+        np.testing.assert_allclose(xdata_as_np_array(new_data_ptr.contents, copy=True), x_array, rtol=1e-6)
+
+    def test_waterfall_round_trip(self):
+        # nz > 1: ydata is one (nz, nx) block and filters run along the last axis
+        nx, nz = 64, 50
+        template = BinPakData()
+        template.name = b"Run-up"
+        template.xCplx = template.zCplx = template.yCplx = 1
+        y_rows = np.random.default_rng(0).standard_normal((nz, nx))
+        new_data_ptr = copy_bin_data(template, np.arange(nx, dtype=float), y_rows, np.linspace(1000, 6000, nz))
+
+        df = py_open_pak_bin_file(ofile, ctypes.byref(ctypes.c_short()), WRITE_MODE)
+        write_data_sets(df, 1, iter([(0, 1, new_data_ptr)]))
+        py_close_pak_bin_file(df)
+
+        try:
+            p_data = read_first_data_set(ofile)
+            y_view = ydata_as_np_array(p_data.contents)
+            self.assertEqual(y_view.shape, (nz, nx))
+            np.testing.assert_array_equal(y_view, y_rows)
+            np.testing.assert_array_equal(zdata_as_np_array(p_data.contents), np.linspace(1000, 6000, nz))
+            np.testing.assert_allclose(apply_gaussian_filter(y_view),
+                                       np.stack([apply_gaussian_filter(row) for row in y_rows]))
+            del y_view
+            py_free_bin_pak_data(p_data)
+        finally:
+            os.remove(ofile)
+
+    def test_complex_round_trip(self):
+        # yCplx = 2: complex128 in, interleaved doubles on disk, complex128 view out
+        nx, nz = 32, 4
+        template = BinPakData()
+        template.name = b"Cross spectrum"
+        template.xCplx = template.zCplx = template.yCplx = 1
+        rng = np.random.default_rng(2)
+        spectrum = rng.standard_normal((nz, nx)) + 1j * rng.standard_normal((nz, nx))
+        new_data_ptr = copy_bin_data(template, np.arange(nx, dtype=float), spectrum, np.arange(nz, dtype=float))
+        self.assertEqual(new_data_ptr.contents.yCplx, 2)
+        self.assertEqual(ctypes.cast(new_data_ptr.contents.ydata[0], ctypes.c_void_p).value, spectrum.ctypes.data)
+
+        df = py_open_pak_bin_file(ofile, ctypes.byref(ctypes.c_short()), WRITE_MODE)
+        write_data_sets(df, 1, iter([(0, 1, new_data_ptr)]))
+        py_close_pak_bin_file(df)
+
+        try:
+            p_data = read_first_data_set(ofile)
+            data = p_data.contents
+            self.assertEqual((data.nx, data.nz, data.yCplx), (nx, nz, 2))
+            y_complex = ydata_as_complex_array(data)
+            self.assertEqual(y_complex.dtype, np.complex128)
+            np.testing.assert_array_equal(y_complex, spectrum)
+            self.assertTrue(np.shares_memory(y_complex, ydata_as_np_array(data)))
+            np.testing.assert_array_equal(ydata_to_np_array(data), spectrum[0])
+            with self.assertRaises(ValueError):
+                ydata_as_complex_array(BinPakData())
+            del y_complex
+            py_free_bin_pak_data(p_data)
+        finally:
+            os.remove(ofile)
+
+    def test_copy_bin_data_checks_rows(self):
+        template = BinPakData()
+        with self.assertRaises(ValueError):
+            copy_bin_data(template, np.zeros(4), np.zeros((3, 4)), np.zeros(2))
+        # Rows shorter than nx would be read past their buffer when written
+        with self.assertRaises(ValueError):
+            copy_bin_data(template, np.zeros(4), np.zeros((2, 3)), np.zeros(2))
+        # Longer rows are cut to nx values
+        y = np.arange(10.0).reshape(2, 5)
+        new_data = copy_bin_data(template, np.zeros(4), y, np.zeros(2)).contents
+        np.testing.assert_array_equal(ydata_as_np_array(new_data, copy=True), y[:, :4])
+
+    def test_copy_bin_data_sets_ycplx_from_dtype(self):
+        template = BinPakData()
+        template.yCplx = 2
+        spectrum = np.ones((2, 4), dtype=np.complex128)
+        self.assertEqual(copy_bin_data(template, np.zeros(4), spectrum, np.zeros(2)).contents.yCplx, 2)
+        # Real values written back into a complex data set, e.g. np.abs(y)
+        self.assertEqual(copy_bin_data(template, np.zeros(4), np.abs(spectrum), np.zeros(2)).contents.yCplx, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests the filter registry and FilterChain in my_function.py. A chain #
+# must give the same result as calling the functions by hand, must not modify    #
+# its inputs, and a threshold mask must keep x and y pairs together.             #
+##################################################################################
+
+import unittest
+import sys
+import os
+import json
+import tempfile
+import numpy as np
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from my_function import *
+
+class TestFilterChain(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.x = np.linspace(0.0, 1.0, 200)
+        self.y = rng.standard_normal((3, 200))
+        self.z = np.array([1.0, 2.0, 3.0])
+
+    def test_matches_manual_calls(self):
+        x0, y0, z0 = self.x.copy(), self.y.copy(), self.z.copy()
+        chain = FilterChain.parse("gaussian:sigma=3, scale:factor=2.5")
+        x, y, z = chain(self.x, self.y, self.z)
+        np.testing.assert_array_equal(x, apply_gaussian_filter(x0, sigma=3))
+        np.testing.assert_array_equal(y, apply_gaussian_filter(y0, sigma=3) * 2.5)
+        np.testing.assert_array_equal(z, apply_gaussian_filter(z0, sigma=3))
+        # Inputs untouched
+        np.testing.assert_array_equal(self.y, y0)
+        np.testing.assert_array_equal(self.x, x0)
+
+    def test_in_place_stages_share_one_buffer(self):
+        calls = []
+        @register_filter("record_buffer", in_place=True, strided=True, targets="y")
+        def record_buffer(arr, out=None):
+            calls.append(out)
+            return out
+        try:
+            _, y, _ = FilterChain.parse("gaussian:on=y,record_buffer,scale:factor=3,record_buffer")(self.x, self.y, self.z)
+        finally:
+            del FILTERS["record_buffer"]
+        self.assertIs(calls[0], calls[1])
+        self.assertIs(calls[0], y)
+
+    def test_threshold_keeps_pairs(self):
+        x, y, _ = FilterChain.parse("threshold:threshold=0.2")(self.x, self.y[:1], self.z[:1])
+        keep = self.y[0] <= 0.2
+        np.testing.assert_array_equal(x, self.x[keep])
+        np.testing.assert_array_equal(y[0], self.y[0][keep])
+
+        # With several rows a sample is kept only if it passes in every row
+        x, y, _ = FilterChain.parse("threshold:threshold=0.2")(self.x, self.y, self.z)
+        keep = (self.y <= 0.2).all(axis=0)
+        self.assertEqual(x.shape, (keep.sum(),))
+        self.assertEqual(y.shape, (3, keep.sum()))
+
+    def test_config_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump([{"filter": "diff"}, {"filter": "scale", "factor": 0.5, "on": "yz"}], f)
+        try:
+            x, y, z = FilterChain.from_arg("@" + f.name)(self.x, self.y, self.z)
+        finally:
+            os.remove(f.name)
+        np.testing.assert_array_equal(x, np.diff(self.x))
+        np.testing.assert_array_equal(y, np.diff(self.y) * 0.5)
+        np.testing.assert_array_equal(z, self.z * 0.5)
+
+    def test_view_results_are_not_written_into(self):
+        y0 = self.y.copy()
+        register_filter("every2", strided=True, targets="xy")(lambda arr: arr[..., ::2])
+        try:
+            x, y, _ = FilterChain.parse("every2,scale:factor=3")(self.x, self.y, self.z)
+        finally:
+            del FILTERS["every2"]
+        np.testing.assert_array_equal(self.y, y0)
+        np.testing.assert_array_equal(y, y0[:, ::2] * 3)
+        self.assertEqual(x.shape, (100,))
+
+    def test_x_and_y_must_stay_paired(self):
+        for spec in ("diff:on=y", "diff:on=x"):
+            with self.assertRaises(ValueError):
+                FilterChain.parse(spec)(self.x, self.y, self.z)
+
+    def test_unknown_filter(self):
+        with self.assertRaises(ValueError):
+            FilterChain.parse("nope")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests the float32 working mode (pak_float32.py). ydata must be read  #
+# as float32 / complex64, filtered in single precision and written as float64,   #
+# data sets not selected must be written exactly as in double precision, and    #
+# the verification report must match the difference between both outputs.       #
+##################################################################################
+
+import unittest
+import sys
+import os
+import tempfile
+import numpy as np
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from read_write import PakFile, copy_bin_data, ydata_as_float32_array, ydata_as_np_array
+from pak_struct import BinPakData
+from pak_mmap import PakMemmap
+from main import process_file, filter_data_set, filter_config_hash, FilterChain
+import pak_float32
+import pak_native
+
+NX = 500
+
+
+def write_input(filename):
+    rng = np.random.default_rng(0)
+    template = BinPakData()
+    template.xCplx = template.zCplx = template.yCplx = 1
+    x = np.arange(NX) * 1e-3
+    z = np.arange(4, dtype=np.float64)
+    # 24-bit ADC counts scaled to volts
+    template.name = b"adc"
+    adc = copy_bin_data(template, x, rng.integers(-2**23, 2**23, size=(4, NX)) * (10.0 / 2**23), z)
+    template.name = b"complex"
+    y = rng.normal(size=(4, NX)) + 1j * rng.normal(size=(4, NX))
+    cplx = copy_bin_data(template, x, y, z)
+    with PakFile(filename, pak_native.WRITE) as pak:
+        pak.write_data_sets(1, [(0, 2, adc), (0, 2, cplx)])
+
+def read_ydata(filename):
+    with PakMemmap(filename) as pak:
+        return {name: np.array(pak.channel(name)[1], dtype=np.float64) for name in ("adc", "complex")}
+
+
+class TestFloat32(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.ifile = os.path.join(self.tmp_dir.name, "in.pak52")
+        write_input(self.ifile)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def output(self, name, *args, **kwargs):
+        ofile = os.path.join(self.tmp_dir.name, name)
+        process_file(self.ifile, ofile, *args, **kwargs)
+        return ofile
+
+    def test_read_as_float32(self):
+        with PakFile(self.ifile) as pak:
+            for _, _, p_data in pak.iter_data_sets():
+                data = p_data.contents
+                y = ydata_as_float32_array(data)
+                self.assertEqual(y.dtype, np.complex64 if data.yCplx == 2 else np.float32)
+                np.testing.assert_array_equal(y.view(np.float32), ydata_as_np_array(data).astype(np.float32))
+
+    def test_chain_keeps_single_precision(self):
+        chain = FilterChain.parse("gaussian,scale:factor=2")
+        y = np.ones((2, 8), dtype=np.float32)
+        _, filtered, _ = chain(np.arange(8.0), y, np.arange(2.0))
+        self.assertEqual(filtered.dtype, np.float32)
+        np.testing.assert_array_equal(filtered, 2.0)
+        self.assertEqual(chain(np.arange(8.0), y.astype(np.complex64), np.arange(2.0))[1].dtype, np.complex64)
+
+    def test_output_and_report(self):
+        for chain in (None, FilterChain.parse("gaussian:sigma=3,scale:factor=0.5")):
+            reference = read_ydata(self.output("f64.pak52", chain))
+            single = read_ydata(self.output("f32.pak52", chain, float32=True))
+            reports = pak_float32.verify(self.ifile, lambda data, float32: filter_data_set(data, chain, float32))
+            self.assertEqual([report.name for report in reports], ["adc", "complex"])
+            for report in reports:
+                max_abs, max_rel = pak_float32.compare(reference[report.name], single[report.name])
+                self.assertEqual(report.samples, reference[report.name].size)
+                self.assertEqual(report.max_abs_error, max_abs)
+                self.assertEqual(report.max_rel_error, max_rel)
+                self.assertGreater(report.max_abs_error, 0.0)
+                self.assertLess(report.max_rel_error, 1e-6)
+            self.assertIn("adc", pak_float32.format_report(reports))
+
+    def test_per_channel(self):
+        reference = self.output("f64.pak52")
+        ofile = self.output("adc.pak52", float32={"adc"})
+        with PakMemmap(reference) as expected, PakMemmap(ofile) as result:
+            np.testing.assert_array_equal(result.channel("complex")[1], expected.channel("complex")[1])
+            self.assertFalse(np.array_equal(result.channel("adc")[1], expected.channel("adc")[1]))
+        self.assertEqual(filter_config_hash(None, False), filter_config_hash())
+        self.assertNotEqual(filter_config_hash(None, {"adc"}), filter_config_hash(None, True))
+
+    def test_compare(self):
+        self.assertEqual(pak_float32.compare(np.array([1.0, -4.0]), np.array([1.5, -4.0])), (0.5, 0.125))
+        self.assertEqual(pak_float32.compare(np.zeros(3), np.zeros(3)), (0.0, 0.0))
+        with self.assertRaises(ValueError):
+            pak_float32.compare(np.zeros(3), np.zeros(2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests incremental reprocessing (main.process_file_incremental). A    #
+# file with three data sets is filtered, rerun unchanged, touched, changed in    #
+# one data set and rerun with other filters; the output must always match a      #
+# full main.py run while only new data sets are filtered, and every data set     #
+# read for filtering must be freed once written.                                 #
+##################################################################################
+
+import unittest
+import sys
+import os
+import tempfile
+import numpy as np
+import warnings
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from read_write import PakFile, copy_bin_data
+from pak_struct import BinPakData
+from main import process_file, process_file_incremental, FilterChain
+import pak_incremental
+import read_write
+import pak_native
+
+
+def write_input(filename, scale=1.0):
+    template = BinPakData()
+    template.xCplx = template.zCplx = template.yCplx = 1
+    x = np.linspace(0.0, 1.0, 64)
+    data_sets = []
+    for i, (i_array, name) in enumerate([(0, b"a"), (0, b"b"), (1, b"c")]):
+        template.name = name
+        z = np.arange(2, dtype=np.float64) + i
+        y = np.sin(np.outer(z + 1, x) * 7) * (scale if name == b"b" else 1.0)
+        data_sets.append((i_array, 2 if i_array == 0 else 1, copy_bin_data(template, x, y, z)))
+    with PakFile(filename, pak_native.WRITE) as pak:
+        pak.write_data_sets(2, data_sets)
+
+def read_bytes(filename):
+    with open(filename, "rb") as f:
+        return f.read()
+
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.ifile = os.path.join(self.tmp_dir.name, "in.pak52")
+        self.ofile = os.path.join(self.tmp_dir.name, "out.pak52")
+        self.expected = os.path.join(self.tmp_dir.name, "expected.pak52")
+        write_input(self.ifile)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def assert_output_matches_full_run(self, chain=None):
+        if os.path.exists(self.expected):
+            os.remove(self.expected)
+        process_file(self.ifile, self.expected, chain)
+        self.assertEqual(read_bytes(self.ofile), read_bytes(self.expected))
+
+    def test_incremental_runs(self):
+        self.assertEqual(process_file_incremental(self.ifile, self.ofile), (0, 3))
+        self.assert_output_matches_full_run()
+        self.assertTrue(os.path.exists(pak_incremental.manifest_path(self.ofile)))
+
+        # Nothing changed: nothing is written
+        mtime = os.stat(self.ofile).st_mtime_ns
+        self.assertEqual(process_file_incremental(self.ifile, self.ofile), (3, 0))
+        self.assertEqual(os.stat(self.ofile).st_mtime_ns, mtime)
+
+        # Touched but same content: data sets are hashed, still nothing to do
+        stat = os.stat(self.ifile)
+        os.utime(self.ifile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(process_file_incremental(self.ifile, self.ofile), (3, 0))
+        self.assertEqual(os.stat(self.ofile).st_mtime_ns, mtime)
+
+        # One data set changed: only that one is filtered
+        write_input(self.ifile, scale=2.0)
+        self.assertEqual(process_file_incremental(self.ifile, self.ofile), (2, 1))
+        self.assert_output_matches_full_run()
+
+        # Other filters: everything is filtered again
+        chain = FilterChain.parse("scale:factor=3")
+        self.assertEqual(process_file_incremental(self.ifile, self.ofile, chain), (0, 3))
+        self.assert_output_matches_full_run(chain)
+
+    def test_output_changed_elsewhere(self):
+        process_file_incremental(self.ifile, self.ofile)
+        os.remove(self.ofile)
+        process_file(self.ifile, self.ofile, FilterChain.parse("scale:factor=3"))
+        # The output no longer is the one in the manifest, so nothing is reused
+        self.assertEqual(process_file_incremental(self.ifile, self.ofile), (0, 3))
+        self.assert_output_matches_full_run()
+
+    def test_input_data_sets_are_freed(self):
+        # The data sets read for filtering are freed once written, so no views of
+        # them stay registered and nothing is deferred
+        before = len(read_write._live_views)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", ResourceWarning)
+            for scale in (2.0, 3.0):
+                write_input(self.ifile, scale)
+                process_file_incremental(self.ifile, self.ofile)
+        self.assertEqual(len(read_write._live_views), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
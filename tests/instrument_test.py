@@ -0,0 +1,67 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests pak_instrument.py. A main.py run over the sample file is       #
+# recorded and the bytes, samples and memory of the calls are checked; with      #
+# instrumentation off nothing may be recorded.                                   #
+##################################################################################
+
+import unittest
+import sys
+import os
+import tempfile
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pak_instrument
+import pak_native
+from main import process_file
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.ifile = os.path.join(os.path.dirname(__file__), '..', 'supporting_files', 'sin_wave.pak52')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.ofile = os.path.join(self.tmp_dir.name, 'out.pak52')
+        self.was_enabled = pak_instrument.is_enabled()
+        pak_instrument.disable()
+
+    def tearDown(self):
+        pak_instrument.disable()
+        if self.was_enabled:
+            pak_instrument.enable()
+        self.tmp_dir.cleanup()
+
+    def test_records_main_run(self):
+        pak_instrument.enable()
+        process_file(self.ifile, self.ofile)
+        summary = {row.name: row for row in pak_instrument.summary()}
+
+        # The single data set is everything after the file and data set headers
+        payload = os.path.getsize(self.ifile) - pak_native.FILE_HEADER_SIZE - pak_native.DATA_SET_HEADER_SIZE
+        self.assertEqual(summary["py_read_one_data_set"].bytes, payload)
+        self.assertEqual(summary["py_write_one_data_set"].bytes, payload)
+        self.assertEqual(summary["py_open_pak_bin_file"].calls, 2)
+        self.assertEqual(summary["xdata_to_np_array"].samples, 201)
+        self.assertEqual(summary["copy_bin_data"].samples, 201 + 201 + 1)
+        self.assertGreater(summary["py_read_one_data_set"].peak_bytes, 0)
+        self.assertGreater(summary["py_read_one_data_set"].seconds, 0.0)
+        self.assertIn("py_read_one_data_set", pak_instrument.format_summary())
+
+        pak_instrument.reset()
+        self.assertEqual(pak_instrument.records(), [])
+
+    def test_time_only(self):
+        pak_instrument.enable(trace_memory=False)
+        process_file(self.ifile, self.ofile)
+        self.assertTrue(pak_instrument.records())
+        self.assertTrue(all(record.peak_bytes is None for record in pak_instrument.records()))
+
+    def test_disabled_records_nothing(self):
+        process_file(self.ifile, self.ofile)
+        self.assertFalse(pak_instrument.is_enabled())
+        self.assertEqual(pak_instrument.records(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
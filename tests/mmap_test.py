@@ -0,0 +1,113 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests the random access reader in pak_mmap.py. The index and the     #
+# memory-mapped views must agree with what the sequential reader returns.        #
+##################################################################################
+
+import unittest
+import sys
+import os
+import ctypes
+import numpy as np
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from read_write import *
+from pak_mmap import PakMemmap, build_index, load_index, sidecar_path
+import pak_mmap
+
+READ_MODE = 1
+WRITE_MODE = 2
+
+
+# Define file names as strings here
+ifile = "supporting_files/sin_wave.pak52"
+ofile = "test_mmap.bin"
+
+class TestPakMemmap(unittest.TestCase):
+    def tearDown(self):
+        for filename in (ofile, sidecar_path(ofile)):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def write_sample(self):
+        template = BinPakData()
+        template.name = b"cached"
+        template.xCplx = template.zCplx = template.yCplx = 1
+        df = py_open_pak_bin_file(ofile, ctypes.byref(ctypes.c_short()), WRITE_MODE)
+        write_data_sets(df, 1, iter([(0, 1, copy_bin_data(template, np.arange(8.0), np.ones(8), np.zeros(1)))]))
+        py_close_pak_bin_file(df)
+
+    def test_index_of_sample_file(self):
+        order, n_data_arrays, entries = build_index(ifile)
+        self.assertEqual((order, n_data_arrays, len(entries)), ("<", 1, 1))
+        entry = entries[0]
+        self.assertEqual(entry.name, "Sine Wave")
+        self.assertEqual((entry.nx, entry.nz, entry.y_cplx), (201, 1, 1))
+        self.assertEqual(entry.end_offset, os.path.getsize(ifile))
+
+    def test_views_match_sequential_read(self):
+        # Several arrays with several data sets of different sizes
+        template = BinPakData()
+        template.xCplx = template.zCplx = template.yCplx = 1
+        rng = np.random.default_rng(1)
+        data_sets = []
+        for i_array, n_data_sets in enumerate([3, 2]):
+            for i_set in range(n_data_sets):
+                template.name = f"ch{i_array}{i_set}".encode('utf-8')
+                nx, nz = 20 + i_set, 1 + i_array
+                data_sets.append((i_array, n_data_sets, copy_bin_data(
+                    template, rng.standard_normal(nx), rng.standard_normal((nz, nx)), np.arange(nz, dtype=float))))
+        df = py_open_pak_bin_file(ofile, ctypes.byref(ctypes.c_short()), WRITE_MODE)
+        write_data_sets(df, 2, iter(data_sets))
+        py_close_pak_bin_file(df)
+
+        with PakMemmap(ofile) as pak:
+            self.assertEqual(pak.names(), ["ch00", "ch01", "ch02", "ch10", "ch11"])
+            for i, (_, _, p_data) in enumerate(data_sets):
+                x, y, z = pak.channel(i)
+                np.testing.assert_array_equal(x, xdata_as_np_array(p_data.contents))
+                np.testing.assert_array_equal(y, ydata_as_np_array(p_data.contents))
+                np.testing.assert_array_equal(z, zdata_as_np_array(p_data.contents))
+            y = pak.ydata("ch11")
+            self.assertEqual(y.shape, (2, 21))
+            self.assertFalse(y.flags.writeable)
+            with self.assertRaises(KeyError):
+                pak.ydata("missing")
+
+    def test_sidecar_index_cache(self):
+        self.write_sample()
+        index = load_index(ofile)
+        self.assertTrue(os.path.exists(sidecar_path(ofile)))
+
+        # Second load comes from the sidecar without scanning the file
+        build_index = pak_mmap.build_index
+        pak_mmap.build_index = None
+        try:
+            self.assertEqual(load_index(ofile), index)
+            self.assertEqual(PakMemmap(ofile).find("cached"), 0)
+        finally:
+            pak_mmap.build_index = build_index
+
+        # Changing the file invalidates the sidecar
+        with open(ofile, "ab") as f:
+            f.write(bytes(8))
+        self.assertIsNone(pak_mmap.load_cached_index(ofile))
+        self.assertEqual(load_index(ofile)[2][0].name, "cached")
+        self.assertIsNotNone(pak_mmap.load_cached_index(ofile))
+
+    def test_atomic_write(self):
+        with pak_mmap.atomic_write(ofile) as fobj:
+            fobj.write(b"first")
+        # A failed write leaves the previous file and no temporary file behind
+        with self.assertRaises(RuntimeError):
+            with pak_mmap.atomic_write(ofile) as fobj:
+                fobj.write(b"half")
+                raise RuntimeError("interrupted")
+        with open(ofile, "rb") as fobj:
+            self.assertEqual(fobj.read(), b"first")
+        self.assertEqual([name for name in os.listdir(".") if name.startswith(ofile + ".")], [])
+
+if __name__ == "__main__":
+    unittest.main()
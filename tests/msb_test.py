@@ -0,0 +1,70 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests big-endian (MSB) PAK files with the fixture                   #
+# supporting_files/sin_wave_msb.pak52, an MSB copy of sin_wave.pak52. Both files #
+# must give the same values through every reader, and writing MSB must          #
+# reproduce the fixture byte for byte.                                           #
+##################################################################################
+
+import unittest
+import sys
+import os
+import filecmp
+import numpy as np
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from read_write import *
+from pak_mmap import PakMemmap
+import pak_native
+
+READ_MODE = 1
+WRITE_MODE = 2
+
+
+# Define file names as strings here
+lsb_file = "supporting_files/sin_wave.pak52"
+msb_file = "supporting_files/sin_wave_msb.pak52"
+ofile = "test_msb.bin"
+
+def read_channel(filename):
+    with PakFile(filename) as pak:
+        p_data = pak.read_one_data_set() if pak.read_data_set_header() else None
+        channel = (xdata_as_np_array(p_data.contents, copy=True), ydata_as_np_array(p_data.contents, copy=True),
+                   zdata_as_np_array(p_data.contents, copy=True))
+        pak.free_data_set(p_data)
+    return channel
+
+class TestMsbFiles(unittest.TestCase):
+    def tearDown(self):
+        if os.path.exists(ofile):
+            os.remove(ofile)
+
+    def test_msb_matches_lsb(self):
+        for lsb, msb in zip(read_channel(lsb_file), read_channel(msb_file)):
+            self.assertTrue(msb.dtype.isnative)
+            np.testing.assert_array_equal(lsb, msb)
+
+    def test_memmap_keeps_file_order(self):
+        with PakMemmap(msb_file, use_cache=False) as msb, PakMemmap(lsb_file, use_cache=False) as lsb:
+            y = msb.ydata(0)
+            self.assertEqual(y.dtype, np.dtype(">f8"))
+            np.testing.assert_array_equal(y * 2.0, lsb.ydata(0) * 2.0)
+            y_native = msb.ydata(0, native=True)
+            self.assertTrue(y_native.dtype.isnative)
+            np.testing.assert_array_equal(y_native, lsb.ydata(0))
+
+    def test_to_native_order_in_place(self):
+        arr = np.arange(4, dtype=">f8")
+        native = pak_native.to_native_order(arr)
+        self.assertTrue(np.shares_memory(arr, native))
+        np.testing.assert_array_equal(native, [0.0, 1.0, 2.0, 3.0])
+
+    def test_write_msb_is_byte_identical(self):
+        with PakFile(lsb_file) as pak_in, PakFile(ofile, WRITE_MODE, byte_order=">") as pak_out:
+            pak_out.write_data_sets(pak_in.n_data_arrays, pak_in.iter_data_sets())
+        self.assertTrue(filecmp.cmp(msb_file, ofile, shallow=False))
+
+if __name__ == "__main__":
+    unittest.main()
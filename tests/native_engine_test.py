@@ -0,0 +1,107 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests the pure Python engine in pak_native.py. It copies the sample  #
+# file through the same calls the wrappers make and checks that the output is    #
+# byte for byte identical to the input, and that read_write falls back to the    #
+# native engine when the DLL cannot be loaded or PAK_ENGINE=native is set.       #
+##################################################################################
+
+import unittest
+import sys
+import os
+import ctypes
+import filecmp
+from unittest import mock
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import read_write
+import pak_native
+
+READ_MODE = 1
+WRITE_MODE = 2
+
+
+# Define file names as strings here
+ifile = "supporting_files/sin_wave.pak52"
+ofile = "test_native.bin"
+
+def copy_pak_file(lib, ifile, ofile):
+    n_data_arrays = ctypes.c_short()
+    dummy = ctypes.c_short()
+    n_data_sets = ctypes.c_long()
+
+    df_i = lib.openPakBinFile(ifile.encode('utf-8'), ctypes.byref(n_data_arrays), READ_MODE)
+    df_o = lib.openPakBinFile(ofile.encode('utf-8'), ctypes.byref(dummy), WRITE_MODE)
+    assert df_i >= 0 and df_o >= 0
+    assert lib.writePakBinFileHeader(df_o, n_data_arrays) == 0
+    for _ in range(n_data_arrays.value):
+        assert lib.readDataSetHeader(df_i, ctypes.byref(n_data_sets)) == 0
+        assert lib.writeDataSetHeader(df_o, n_data_sets) == 0
+        for _ in range(n_data_sets.value):
+            p_data = lib.readOneDataSet(df_i)
+            assert p_data
+            assert lib.writeOneDataSet(df_o, p_data) == 0
+            lib.freeBinPakData(p_data)
+    lib.closePakBinFile(df_i)
+    lib.closePakBinFile(df_o)
+
+class TestNativeEngine(unittest.TestCase):
+    def tearDown(self):
+        if os.path.exists(ofile):
+            os.remove(ofile)
+
+    def test_copy_is_byte_identical(self):
+        copy_pak_file(pak_native, ifile, ofile)
+        self.assertTrue(filecmp.cmp(ifile, ofile, shallow=False))
+
+    def test_header_and_values(self):
+        n_data_arrays = ctypes.c_short()
+        n_data_sets = ctypes.c_long()
+        df = pak_native.openPakBinFile(ifile, ctypes.byref(n_data_arrays), READ_MODE)
+        self.assertEqual(n_data_arrays.value, 1)
+        self.assertEqual(pak_native.readDataSetHeader(df, ctypes.byref(n_data_sets)), 0)
+        self.assertEqual(n_data_sets.value, 1)
+
+        p_data = pak_native.readOneDataSet(df)
+        data = p_data.contents
+        self.assertEqual(data.name, b"Sine Wave")
+        self.assertEqual((data.xCplx, data.nx, data.zCplx, data.nz, data.yCplx), (1, 201, 1, 1, 1))
+        self.assertEqual(data.xdata[0], 0.0)
+        self.assertAlmostEqual(data.xdata[1], 0.005)
+        pak_native.freeBinPakData(p_data)
+        self.assertFalse(data.xdata)
+        pak_native.closePakBinFile(df)
+
+    def load_engine(self, pak_engine_env=None):
+        # Loads the engine from scratch with a DLL that cannot be loaded, the
+        # environment and the engine already loaded are restored afterwards
+        with mock.patch.dict(os.environ), \
+             mock.patch.object(ctypes, "CDLL", side_effect=OSError("cannot load DLL")) as cdll, \
+             mock.patch.object(read_write, "_engine", None), \
+             mock.patch.object(read_write, "pak_lib", read_write._LazyPakLib()):
+            os.environ.pop("PAK_ENGINE", None)
+            if pak_engine_env is not None:
+                os.environ["PAK_ENGINE"] = pak_engine_env
+            engine = read_write.pak_engine()
+            self.assertIs(read_write.pak_lib, pak_native)
+        return engine, cdll
+
+    def test_fallback_when_dll_fails(self):
+        engine, cdll = self.load_engine()
+        self.assertEqual(engine, "native")
+        cdll.assert_called_once()
+
+    def test_engine_from_environment(self):
+        engine, cdll = self.load_engine("native")
+        self.assertEqual(engine, "native")
+        cdll.assert_not_called()
+
+    def test_invalid_byte_order(self):
+        with open(ofile, "wb") as f:
+            f.write(b"XYZ" + bytes(13))
+        self.assertEqual(pak_native.openPakBinFile(ofile, ctypes.byref(ctypes.c_short()), READ_MODE), -3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests PakFile, the per-handle file object. An MSB copy of the sample #
+# file is written, then LSB and MSB files are read at the same time from a       #
+# thread pool; every read must return the same values.                           #
+##################################################################################
+
+import unittest
+import sys
+import os
+import concurrent.futures
+import numpy as np
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from read_write import *
+
+READ_MODE = 1
+WRITE_MODE = 2
+
+
+# Define file names as strings here
+ifile = "supporting_files/sin_wave.pak52"
+ofile = "test_pak_file_msb.bin"
+
+def read_all(filename):
+    with PakFile(filename) as pak:
+        return pak.byte_order, [(xdata_as_np_array(p.contents, copy=True), ydata_as_np_array(p.contents, copy=True))
+                                for _, _, p in pak.iter_data_sets()]
+
+class TestPakFile(unittest.TestCase):
+    def tearDown(self):
+        if os.path.exists(ofile):
+            os.remove(ofile)
+
+    def test_concurrent_lsb_and_msb_reads(self):
+        with PakFile(ifile) as pak_in, PakFile(ofile, WRITE_MODE, byte_order=">") as pak_out:
+            pak_out.write_data_sets(pak_in.n_data_arrays, pak_in.iter_data_sets())
+        with open(ofile, "rb") as f:
+            self.assertEqual(f.read(3), b"MSB")
+
+        _, expected = read_all(ifile)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(read_all, [ifile, ofile] * 16))
+        for i, (byte_order, data_sets) in enumerate(results):
+            self.assertEqual(byte_order, "<" if i % 2 == 0 else ">")
+            for (x, y), (x_ref, y_ref) in zip(data_sets, expected):
+                np.testing.assert_array_equal(x, x_ref)
+                np.testing.assert_array_equal(y, y_ref)
+
+    def test_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            PakFile("does_not_exist.pak52")
+
+if __name__ == "__main__":
+    unittest.main()
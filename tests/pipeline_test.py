@@ -0,0 +1,103 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests the read/filter/write pipeline (pak_pipeline.py). The output   #
+# must match a serial main.py run, order must be kept, no more than the allowed  #
+# number of items may be in flight and errors in any stage must be raised with  #
+# every item released.                                                           #
+##################################################################################
+
+import unittest
+import sys
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from read_write import PakFile, copy_bin_data
+from pak_struct import BinPakData
+from pak_pipeline import run_pipeline
+from main import process_file, process_file_pipelined
+import pak_native
+
+
+# Items handed out by a source that have not been released yet
+class Tracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.live = 0
+        self.max_live = 0
+
+    def source(self, n, fail_at=None):
+        for i in range(n):
+            if i == fail_at:
+                raise OSError("read failed")
+            with self.lock:
+                self.live += 1
+                self.max_live = max(self.max_live, self.live)
+            yield i
+
+    def release(self, item, result):
+        with self.lock:
+            self.live -= 1
+
+def slow_square(item):
+    time.sleep(0.002)
+    return item * item
+
+
+class TestPipeline(unittest.TestCase):
+    def test_order_and_in_flight_cap(self):
+        for max_in_flight in (1, 2, 5):
+            tracker = Tracker()
+            written = []
+            run_pipeline(tracker.source(30), slow_square, written.extend, tracker.release, max_in_flight)
+            self.assertEqual(written, [i * i for i in range(30)])
+            self.assertEqual(tracker.live, 0)
+            self.assertLessEqual(tracker.max_live, max_in_flight)
+
+    def test_errors_release_everything(self):
+        def failing_stage(item):
+            if item == 7:
+                raise ValueError("filter failed")
+            return item
+
+        def failing_sink(results):
+            for result in results:
+                if result == 25:
+                    raise RuntimeError("write failed")
+
+        cases = [(failing_stage, list, None, ValueError),
+                 (slow_square, failing_sink, None, RuntimeError),
+                 (slow_square, list, 4, OSError)]
+        for stage, sink, fail_at, error in cases:
+            tracker = Tracker()
+            with self.assertRaises(error):
+                run_pipeline(tracker.source(20, fail_at), stage, sink, tracker.release, 3)
+            self.assertEqual(tracker.live, 0)
+
+    def test_matches_serial_run(self):
+        template = BinPakData()
+        template.xCplx = template.zCplx = template.yCplx = 1
+        x = np.linspace(0.0, 1.0, 100)
+        data_sets = []
+        for i in range(12):
+            template.name = f"channel {i}".encode("utf-8")
+            z = np.arange(3, dtype=np.float64)
+            data_sets.append((0 if i < 5 else 2, 5 if i < 5 else 7, copy_bin_data(template, x, np.sin(np.outer(z + i, x)), z)))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ifile, serial, pipelined = (os.path.join(tmp_dir, name) for name in ("in.pak52", "serial.pak52", "pipelined.pak52"))
+            with PakFile(ifile, pak_native.WRITE) as pak:
+                pak.write_data_sets(3, data_sets)  # array 1 is empty
+            process_file(ifile, serial)
+            process_file_pipelined(ifile, pipelined, max_in_flight=2)
+            with open(serial, "rb") as f_serial, open(pipelined, "rb") as f_pipelined:
+                self.assertEqual(f_serial.read(), f_pipelined.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
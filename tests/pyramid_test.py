@@ -0,0 +1,124 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests the min/max pyramids of pak_pyramid.py. Every stored level     #
+# must match a brute force min/max of the samples, envelope() must pick the      #
+# level for the requested width and cover the x-range, and a pyramid must be     #
+# rebuilt when the PAK file changes.                                             #
+##################################################################################
+
+import unittest
+import sys
+import os
+import tempfile
+import numpy as np
+from unittest import mock
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from read_write import PakFile, copy_bin_data
+from pak_struct import BinPakData
+from pak_pyramid import PakPyramid, build_pyramid, pyramid_path
+import pak_pyramid
+import pak_native
+
+NX = 1000
+
+
+def write_input(filename, seed=0):
+    rng = np.random.default_rng(seed)
+    template = BinPakData()
+    template.xCplx = template.zCplx = template.yCplx = 1
+    x = np.arange(NX) * 0.5
+    z = np.arange(3, dtype=np.float64)
+    template.name = b"real"
+    y_real = rng.normal(size=(3, NX))
+    real = copy_bin_data(template, x, y_real, z)
+    template.name = b"complex"
+    y = rng.normal(size=(3, NX)) + 1j * rng.normal(size=(3, NX))
+    cplx = copy_bin_data(template, x, y, z)
+    with PakFile(filename, pak_native.WRITE) as pak:
+        pak.write_data_sets(1, [(0, 2, real), (0, 2, cplx)])
+    return x, {"real": y_real, "complex": np.abs(y)}
+
+def brute_force(values, size):
+    bins = [values[..., i:i + size] for i in range(0, values.shape[-1], size)]
+    return np.stack([b.min(axis=-1) for b in bins], axis=-1), np.stack([b.max(axis=-1) for b in bins], axis=-1)
+
+
+class TestPyramid(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, "data.pak52")
+        self.x, self.y = write_input(self.filename)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_levels_match_brute_force(self):
+        with PakPyramid(self.filename, base_level=2) as pyramid:
+            for name, y in self.y.items():
+                levels = pyramid.data_sets[pyramid.pak.find(name)]["levels"]
+                self.assertEqual([l["level"] for l in levels], list(range(2, 11)))
+                for stored in levels:
+                    mins, maxs = brute_force(y, 1 << stored["level"])
+                    values = pyramid.level(name, stored["level"])
+                    np.testing.assert_allclose(values[..., 0], mins, rtol=1e-15)
+                    np.testing.assert_allclose(values[..., 1], maxs, rtol=1e-15)
+
+    def test_chunks_bound_memory(self):
+        # Every chunk holds at most BUILD_CHUNK_SIZE values over all rows, also
+        # for complex ydata, and the levels do not depend on the chunking
+        sizes = []
+        reduce = pak_pyramid._reduce
+        def recording_reduce(values, size):
+            sizes.append(values.size)
+            return reduce(values, size)
+        with mock.patch.object(pak_pyramid, "BUILD_CHUNK_SIZE", 96), \
+             mock.patch.object(pak_pyramid, "_reduce", recording_reduce):
+            build_pyramid(self.filename, base_level=2)
+        self.assertLessEqual(max(sizes), 96)
+        with PakPyramid(self.filename, base_level=2) as pyramid:
+            for name, y in self.y.items():
+                np.testing.assert_allclose(pyramid.level(name, 2)[..., 1], brute_force(y, 4)[1], rtol=1e-15)
+
+    def test_envelope(self):
+        y = self.y["real"][1]
+        with PakPyramid(self.filename) as pyramid:
+            # 1000 samples on 100 pixels -> 2**3 samples per bin, computed from the samples
+            envelope = pyramid.envelope("real", 0.0, 500.0, 100, row=1)
+            self.assertEqual(envelope.level, 3)
+            self.assertEqual(len(envelope.x), 125)
+            np.testing.assert_array_equal(envelope.x, self.x[::8])
+            np.testing.assert_array_equal(envelope.y_min, brute_force(y, 8)[0])
+
+            # Stored level, the bins cover the whole range
+            envelope = pyramid.envelope("real", 100.0, 300.0, 10, row=1)
+            self.assertEqual(envelope.level, 5)
+            self.assertLessEqual(envelope.x[0], 100.0)
+            self.assertLessEqual(envelope.y_min.min(), y[200:600].min())
+            self.assertEqual(envelope.y_max.max(), y[192:608].max())
+
+            # More pixels than samples: the samples themselves
+            envelope = pyramid.envelope("complex", 10.0, 20.0, 100, row=2)
+            self.assertEqual(envelope.level, 0)
+            np.testing.assert_array_equal(envelope.x, self.x[20:40])
+            np.testing.assert_allclose(envelope.y_max, self.y["complex"][2, 20:40], rtol=1e-15)
+
+            self.assertEqual(len(pyramid.envelope("real", 600.0, 700.0, 10).x), 0)
+
+    def test_stale_pyramid_is_rebuilt(self):
+        build_pyramid(self.filename)
+        PakPyramid(self.filename, build=False).close()  # up to date
+        stat = os.stat(self.filename)
+        _, y = write_input(self.filename, seed=1)
+        os.utime(self.filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        with self.assertRaises(ValueError):
+            PakPyramid(self.filename, build=False)
+        with PakPyramid(self.filename) as pyramid:
+            self.assertEqual(pyramid.level("real", 9)[0, 0, 1], y["real"][0, :512].max())
+        self.assertTrue(os.path.exists(pyramid_path(self.filename)))
+
+
+if __name__ == "__main__":
+    unittest.main()
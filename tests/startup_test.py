@@ -0,0 +1,55 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file checks the startup cost of main.py. Importing it must not load      #
+# SciPy or the PAK engine and must stay under STARTUP_TARGET seconds; a run     #
+# whose filters do not need SciPy must not import it at all. Every check runs   #
+# in a fresh interpreter so modules loaded by other tests do not count.          #
+##################################################################################
+
+import unittest
+import sys
+import os
+import json
+import subprocess
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Import time of main.py (NumPy is most of it, SciPy alone used to be ~0.35 s)
+STARTUP_TARGET = 0.5
+
+def run_fresh(code):
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestStartup(unittest.TestCase):
+    def test_import_is_lazy_and_fast(self):
+        # Best of a few runs so a busy machine does not fail the test
+        runs = [run_fresh(
+            "import json, sys, time\n"
+            "start = time.perf_counter()\n"
+            "import main, read_write\n"
+            "print(json.dumps([time.perf_counter() - start, 'scipy' in sys.modules, read_write._engine is None]))")
+            for _ in range(3)]
+        seconds = min(run[0] for run in runs)
+        _, scipy_loaded, engine_lazy = runs[0]
+        self.assertFalse(scipy_loaded)
+        self.assertTrue(engine_lazy)
+        self.assertLess(seconds, STARTUP_TARGET, f"importing main.py took {seconds:.3f} s")
+
+    def test_run_without_scipy(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ofile = os.path.join(tmp_dir, "out.pak52")
+            scipy_loaded, engine = run_fresh(
+                "import json, sys, main, read_write\n"
+                f"main.main(['main.py', 'supporting_files/sin_wave.pak52', {ofile!r}, 'scale:factor=2'])\n"
+                "print(json.dumps(['scipy' in sys.modules, read_write.pak_engine()]))")
+            self.assertFalse(scipy_loaded)
+            self.assertIn(engine, ("dll", "native"))
+            self.assertTrue(os.path.exists(ofile))
+
+
+if __name__ == "__main__":
+    unittest.main()
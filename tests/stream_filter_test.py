@@ -0,0 +1,99 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests the block-streaming filter in pak_stream.py. Filtering in      #
+# small chunks with halos must give exactly the same file as main.py, which     #
+# filters each whole array at once.                                              #
+##################################################################################
+
+import unittest
+import sys
+import os
+import ctypes
+import filecmp
+import numpy as np
+from unittest import mock
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from read_write import *
+from main import process_file
+from pak_stream import stream_filter_file, iter_filtered_chunks, gaussian_halo
+from my_function import apply_gaussian_filter
+import pak_native
+
+WRITE_MODE = 2
+
+
+# Define file names as strings here
+ifile = "supporting_files/sin_wave.pak52"
+long_file = "test_stream_long.bin"
+ofile = "test_stream_chunked.bin"
+ref_file = "test_stream_whole.bin"
+
+class TestStreamFilter(unittest.TestCase):
+    def tearDown(self):
+        for filename in (long_file, ofile, ref_file):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def test_chunks_match_whole_array(self):
+        arr = np.random.default_rng(0).standard_normal(1000)
+        halo = gaussian_halo(2)
+        for chunk_size in (1, 7, 64, 999, 5000):
+            position = [0]
+            def read(count):
+                position[0] += count
+                return arr[position[0] - count:position[0]]
+            chunks = list(iter_filtered_chunks(read, arr.size, apply_gaussian_filter, halo, chunk_size))
+            np.testing.assert_array_equal(np.concatenate(chunks), apply_gaussian_filter(arr))
+
+    def test_sample_file_matches_main(self):
+        process_file(ifile, ref_file)
+        stream_filter_file(ifile, ofile, chunk_size=16)
+        self.assertTrue(filecmp.cmp(ref_file, ofile, shallow=False))
+
+    def test_long_waterfall_matches_main(self):
+        nx, nz = 10000, 3
+        template = BinPakData()
+        template.name = b"Endurance"
+        template.xCplx = template.zCplx = template.yCplx = 1
+        rng = np.random.default_rng(1)
+        df = py_open_pak_bin_file(long_file, ctypes.byref(ctypes.c_short()), WRITE_MODE)
+        write_data_sets(df, 1, iter([(0, 1, copy_bin_data(template, np.arange(nx) * 1e-3,
+                                                           rng.standard_normal((nz, nx)), np.arange(nz, dtype=float)))]))
+        py_close_pak_bin_file(df)
+
+        process_file(long_file, ref_file)
+        stream_filter_file(long_file, ofile, chunk_size=777)
+        self.assertTrue(filecmp.cmp(ref_file, ofile, shallow=False))
+
+    def test_complex_matches_main(self):
+        # Streaming filters re and im separately, main.py filters complex128 values
+        nx = 3000
+        template = BinPakData()
+        template.name = b"Spectrum"
+        template.xCplx = template.zCplx = template.yCplx = 1
+        rng = np.random.default_rng(3)
+        spectrum = rng.standard_normal(nx) + 1j * rng.standard_normal(nx)
+        df = py_open_pak_bin_file(long_file, ctypes.byref(ctypes.c_short()), WRITE_MODE)
+        write_data_sets(df, 1, iter([(0, 1, copy_bin_data(template, np.arange(nx) * 1.0, spectrum, np.zeros(1)))]))
+        py_close_pak_bin_file(df)
+
+        process_file(long_file, ref_file)
+        stream_filter_file(long_file, ofile, chunk_size=500)
+        with PakFile(ref_file) as ref, PakFile(ofile) as out:
+            for (_, _, p_ref), (_, _, p_out) in zip(ref.iter_data_sets(), out.iter_data_sets()):
+                self.assertEqual(p_out.contents.yCplx, 2)
+                np.testing.assert_allclose(ydata_as_complex_array(p_out.contents, copy=True),
+                                           ydata_as_complex_array(p_ref.contents, copy=True), rtol=0, atol=1e-12)
+
+    def test_failed_writes_raise(self):
+        # e.g. a full disk: the run must fail instead of leaving a truncated file
+        for function in ("writePakBinFileHeader", "writeDataSetHeader", "writeDataSetName", "write_values"):
+            with self.subTest(function=function), mock.patch.object(pak_native, function, return_value=-1):
+                with self.assertRaises(RuntimeError):
+                    stream_filter_file(ifile, ofile, chunk_size=50)
+
+if __name__ == "__main__":
+    unittest.main()
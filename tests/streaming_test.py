@@ -0,0 +1,98 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests streaming whole files with iter_data_sets/write_data_sets. A   #
+# file with several data set arrays (one of them empty) is generated, streamed   #
+# to a second file and both are compared byte for byte.                          #
+##################################################################################
+
+import unittest
+import sys
+import os
+import ctypes
+import filecmp
+import gc
+import warnings
+import numpy as np
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from read_write import *
+from main import process_file, process_file_pipelined, FilterChain
+
+READ_MODE = 1
+WRITE_MODE = 2
+
+
+# Define file names as strings here
+ifile = "test_stream_in.bin"
+ofile = "test_stream_out.bin"
+
+# Number of data sets in each data set array of the generated file
+ARRAY_SIZES = [2, 0, 3]
+
+def make_data_set(name, nx, seed):
+    template = BinPakData()
+    template.name = name.encode('utf-8')
+    template.xCplx = template.zCplx = template.yCplx = 1
+    rng = np.random.default_rng(seed)
+    return copy_bin_data(template, np.arange(nx) * 0.5, rng.standard_normal(nx), np.zeros(1))
+
+def generate_file(filename):
+    data_sets = [(i_array, n_data_sets, make_data_set(f"array {i_array} set {i_set}", 10 + i_set, i_set))
+                 for i_array, n_data_sets in enumerate(ARRAY_SIZES)
+                 for i_set in range(n_data_sets)]
+    df = py_open_pak_bin_file(filename, ctypes.byref(ctypes.c_short()), WRITE_MODE)
+    write_data_sets(df, len(ARRAY_SIZES), iter(data_sets))
+    py_close_pak_bin_file(df)
+
+class TestStreaming(unittest.TestCase):
+    def tearDown(self):
+        for filename in (ifile, ofile):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def test_stream_copy(self):
+        generate_file(ifile)
+
+        n_data_arrays = ctypes.c_short()
+        df_i = py_open_pak_bin_file(ifile, ctypes.byref(n_data_arrays), READ_MODE)
+        df_o = py_open_pak_bin_file(ofile, ctypes.byref(ctypes.c_short()), WRITE_MODE)
+        self.assertEqual(n_data_arrays.value, len(ARRAY_SIZES))
+
+        names = []
+        def record(data_sets):
+            for i_array, n_data_sets, p_data in data_sets:
+                names.append(p_data.contents.name.decode('utf-8'))
+                yield i_array, n_data_sets, p_data
+        write_data_sets(df_o, n_data_arrays, record(iter_data_sets(df_i, n_data_arrays)))
+        py_close_pak_bin_file(df_i)
+        py_close_pak_bin_file(df_o)
+
+        self.assertEqual(names, ["array 0 set 0", "array 0 set 1",
+                                 "array 2 set 0", "array 2 set 1", "array 2 set 2"])
+        self.assertTrue(filecmp.cmp(ifile, ofile, shallow=False))
+
+    def test_wrong_count_raises(self):
+        df = py_open_pak_bin_file(ofile, ctypes.byref(ctypes.c_short()), WRITE_MODE)
+        with self.assertRaises(RuntimeError):
+            write_data_sets(df, 1, iter([(0, 2, make_data_set("only one", 4, 0))]))
+        py_close_pak_bin_file(df)
+
+    def test_input_freed_without_deferring(self):
+        # ydata left unfiltered must not keep the freed input data sets alive,
+        # with or without the garbage collector
+        generate_file(ifile)
+        gc.disable()
+        try:
+            for process in (process_file, process_file_pipelined):
+                with self.subTest(process=process.__name__), warnings.catch_warnings():
+                    warnings.simplefilter("error", ResourceWarning)
+                    if os.path.exists(ofile):
+                        os.remove(ofile)
+                    process(ifile, ofile, FilterChain.parse("scale:factor=2:on=x"))
+        finally:
+            gc.enable()
+
+if __name__ == "__main__":
+    unittest.main()
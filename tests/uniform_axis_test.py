@@ -0,0 +1,93 @@
+# Property of Whisper Aero
+
+##################################################################################
+# This file tests the implicit x axis (UniformAxis). The evenly spaced x axis of #
+# sin_wave.pak52 must be detected, expand to exactly the stored values, stay     #
+# compact through filters that do not touch x and be written out in full.        #
+##################################################################################
+
+import unittest
+import sys
+import os
+import ctypes
+import numpy as np
+from unittest import mock
+
+# Line below needed in some instances depending on file structure and where program is called from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from read_write import *
+from my_function import *
+import read_write
+
+READ_MODE = 1
+
+# Define file names as strings here
+ifile = "supporting_files/sin_wave.pak52"
+
+def read_first_data_set(ifile):
+    n_data_arrays = ctypes.c_short()
+    n_data_sets = ctypes.c_long()
+    df = py_open_pak_bin_file(ifile, ctypes.byref(n_data_arrays), READ_MODE)
+    py_read_data_set_header(df, ctypes.byref(n_data_sets))
+    p_data = py_read_one_data_set(df)
+    py_close_pak_bin_file(df)
+    return p_data
+
+class TestUniformAxis(unittest.TestCase):
+    def setUp(self):
+        self.p_data = read_first_data_set(ifile)
+        self.data = self.p_data.contents
+
+    def tearDown(self):
+        py_free_bin_pak_data(self.p_data)
+
+    def test_detected_and_exact(self):
+        axis = xdata_as_axis(self.data)
+        x = xdata_to_np_array(self.data)
+        self.assertIsInstance(axis, UniformAxis)
+        self.assertEqual((axis.x0, axis.dx, len(axis)), (0.0, 0.005, 201))
+        np.testing.assert_array_equal(np.asarray(axis), x)
+        self.assertEqual(axis[1], x[1])
+        self.assertEqual(axis[-1], x[-1])
+        np.testing.assert_array_equal(axis[10:20], x[10:20])
+        with self.assertRaises(IndexError):
+            axis[201]
+
+    def test_not_uniform(self):
+        self.assertIsNone(uniform_axis(np.array([0.0, 1.0, 3.0])))
+        self.assertIsNone(uniform_axis(np.array([0.0, 0.1 + 1e-12, 0.2])))
+        self.assertIsNone(uniform_axis(np.array([0.0, np.nan])))
+        self.assertIsInstance(uniform_axis(np.array([2.5])), UniformAxis)
+
+    def test_blockwise_check(self):
+        # Checked in blocks of 3 samples: a mismatch in any block, also in the
+        # last partial one, is found without expanding the axis
+        x = 1.5 + 0.25 * np.arange(10)
+        with mock.patch.object(read_write, "AXIS_CHECK_BLOCK", 3), \
+             mock.patch.object(UniformAxis, "expand", side_effect=AssertionError("expanded")):
+            self.assertEqual(uniform_axis(x).dx, 0.25)
+            for i in (1, 4, 7, 9):
+                bad = x.copy()
+                bad[i] += 1e-9
+                self.assertIsNone(uniform_axis(bad))
+
+    def test_filters_and_write(self):
+        axis = xdata_as_axis(self.data)
+        y = ydata_as_np_array(self.data)
+        z = zdata_to_np_array(self.data)
+
+        # A chain that does not touch x keeps it compact
+        x_out, y_out, _ = FilterChain.parse("scale:factor=2")(axis, y, z)
+        self.assertIs(x_out, axis)
+        # One that does works on the expanded values
+        x_out, _, _ = FilterChain.parse("gaussian")(axis, y, z)
+        np.testing.assert_array_equal(x_out, apply_gaussian_filter(xdata_to_np_array(self.data)))
+
+        # The written data set holds the full x block
+        new_data = copy_bin_data(self.data, axis, y_out, z).contents
+        self.assertEqual(new_data.nx, 201)
+        np.testing.assert_array_equal(xdata_as_np_array(new_data, copy=True), xdata_to_np_array(self.data))
+
+
+if __name__ == "__main__":
+    unittest.main()